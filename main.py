@@ -1,11 +1,105 @@
 import sys
 import os
-from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QFont, QIcon  # 引入 QIcon
-from src.ui.main_window import MainWindow
+import argparse
+import multiprocessing
 from src.utils.logger import setup_logger
 from src.core.config_manager import ConfigManager
 from src.utils.constants import ASSETS_DIR  # 引入资源路径常量
+from src.core.move_executor import OUTPUT_MODES, DURABILITY_MODES
+from src.core.plan_file import CONFLICT_POLICIES, run_plan
+from src.core.io_throttle import IoThrottle
+from src.core.transcoder import Transcoder
+from src.core.archive_exporter import ArchiveExporter, ARCHIVE_FORMATS, ARCHIVE_GROUPS
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Photo Renamer Pro (不带参数时启动图形界面)")
+    parser.add_argument('--run-plan', metavar='PLAN', help="无界面执行导出的重命名计划 (.csv / .jsonl)")
+    parser.add_argument('--undo-last', action='store_true', help="无界面撤销最近一个批次")
+    parser.add_argument('--mode', choices=OUTPUT_MODES,
+                        help="输出模式 (默认取设置中的 output_mode)")
+    parser.add_argument('--workers', type=int, help="每个设备组的线程数 (默认取设置)")
+    parser.add_argument('--durability', choices=DURABILITY_MODES, help="落盘策略 (默认取设置)")
+    parser.add_argument('--max-mb-per-sec', type=float, help="带宽上限 MB/s (0 不限，默认取设置)")
+    parser.add_argument('--max-files-per-sec', type=float, help="每秒文件数上限 (0 不限，默认取设置)")
+    parser.add_argument('--max-in-flight', type=int, help="同时进行的操作数上限 (0 不限，默认取设置)")
+    parser.add_argument('--adaptive', action='store_true', help="按延迟自动调整并发")
+    parser.add_argument('--max-dimension', type=int, help="转码: 长边像素上限 (0 不缩小，默认取设置)")
+    parser.add_argument('--quality', type=int, help="转码: JPEG 质量 1-100 (默认取设置)")
+    parser.add_argument('--cold-dir', help="转码: 原文件移到此目录 (默认取设置，留空保留原文件)")
+    parser.add_argument('--archive-format', choices=ARCHIVE_FORMATS, help="打包导出: 归档格式 (默认取设置)")
+    parser.add_argument('--archive-group', choices=ARCHIVE_GROUPS, help="打包导出: 每个机台号 / 每个文件夹一个归档 (默认取设置)")
+    parser.add_argument('--force', action='store_true', help="目标盘空间不足时仍然执行")
+    parser.add_argument('--on-conflict', choices=CONFLICT_POLICIES, default='skip',
+                        help="目标已存在时的处理方式 (默认跳过)")
+    # Qt 自己的参数 (如 -platform) 原样留给 QApplication
+    return parser.parse_known_args(argv)
+
+
+def output_roots(settings):
+    """Regular / Issue 输出根目录 (打包导出按机台分组时归档放在这里)"""
+    last_session = settings.get('last_session', {})
+    return [last_session.get('regular_output_dir'), last_session.get('issue_output_dir')]
+
+
+def run_headless(args):
+    """命令行模式：不导入任何 Qt 模块，可在没有显示器的文件服务器上运行"""
+    settings = ConfigManager.load_settings()
+    exec_cfg = settings.get('execution', {})
+    workers = args.workers or exec_cfg.get('workers_per_device', 4)
+    durability = args.durability or exec_cfg.get('durability', 'none')
+    # 命令行参数覆盖设置中的限速项
+    for key in ('max_mb_per_sec', 'max_files_per_sec', 'max_in_flight'):
+        if getattr(args, key) is not None:
+            exec_cfg[key] = getattr(args, key)
+    if args.adaptive:
+        exec_cfg['adaptive_throttle'] = True
+    for arg, key in (('max_dimension', 'transcode_max_dimension'), ('quality', 'transcode_quality'),
+                     ('cold_dir', 'cold_dir'), ('archive_format', 'archive_format'),
+                     ('archive_group', 'archive_group')):
+        if getattr(args, arg) is not None:
+            exec_cfg[key] = getattr(args, arg)
+    throttle = IoThrottle.from_settings(exec_cfg)
+
+    if args.undo_last:
+        from src.core.batch_undo import undo_last_batch
+        summary = undo_last_batch(workers_per_group=workers, durability=durability, throttle=throttle)
+        if summary is None:
+            print("没有可撤销的批次。")
+            return 0
+        print(f"已恢复 {summary['restored']}，跳过 {summary['skipped']}，取消 {summary['cancelled']}，"
+              f"失败 {summary['errors']}")
+        for line in summary['details']:
+            print("  " + line)
+        return 1 if summary['errors'] or summary['cancelled'] else 0
+
+    printed = set()
+
+    def on_result(op, done, total):
+        # 打包导出同一进度会回调两次 (条目写入 + 归档落地)，每个进度只打印一次
+        if (done == total or done % 500 == 0) and done not in printed:
+            printed.add(done)
+            print(f"  {done}/{total}")
+
+    result = run_plan(args.run_plan, mode=args.mode or exec_cfg.get('output_mode', 'move'),
+                      workers_per_group=workers, on_conflict=args.on_conflict, on_result=on_result,
+                      durability=durability, throttle=throttle, force=args.force,
+                      transcoder=Transcoder.from_settings(exec_cfg, durability, throttle=throttle),
+                      archiver=ArchiveExporter.from_settings(exec_cfg, roots=output_roots(settings),
+                                                             durability=durability, throttle=throttle,
+                                                             illegal_chars=settings.get('illegal_chars')))
+    print(result['preflight'])
+    if result.get('aborted'):
+        print(f"❌ 已放弃执行: {result['aborted']} (使用 --force 强制执行)")
+        return 1
+    print(f"计划 {result['planned']} 项：完成 {result['done']}，跳过 {result['skipped']}"
+          f" (未就绪 {result['not_ready']}，冲突 {result['conflicts']})，失败 {result['errors']}")
+    for line in result['details']:
+        print("  " + line)
+    if result['rate']:
+        print(f"📶 实际速率: {result['rate']}")
+    print(f"📝 操作日志: {result['log_file']}")
+    return 1 if result['errors'] else 0
 
 
 def main():
@@ -15,8 +109,16 @@ def main():
     # 2. 确保配置存在
     ConfigManager.ensure_defaults()
 
+    args, qt_argv = parse_args(sys.argv[1:])
+    if args.run_plan or args.undo_last:
+        sys.exit(run_headless(args))
+
     # 3. 启动应用
-    app = QApplication(sys.argv)
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QFont, QIcon  # 引入 QIcon
+    from src.ui.main_window import MainWindow
+
+    app = QApplication(sys.argv[:1] + qt_argv)
     app.setApplicationName("Photo Renamer Pro")
 
     # 🔥🔥🔥 修复点：加载图标 🔥🔥🔥
@@ -44,4 +146,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序里，进程池的子进程也从这里启动
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,259 @@
+import os
+import time
+import queue
+import hashlib
+import tarfile
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from src.core.move_executor import COPY_CHUNK, fsync_path, fsync_dir
+from src.utils.constants import DEFAULT_SETTINGS
+
+ARCHIVE_FORMATS = ('zip', 'tar')
+
+# 分组方式
+#   rel_no - 每个机台号一个归档，归档内保留模板生成的文件夹结构
+#   folder - 每个目标文件夹一个归档 (归档放在该文件夹旁边，同名)
+ARCHIVE_GROUPS = ('rel_no', 'folder')
+
+# ZIP 不能表示 1980 年以前的时间
+ZIP_EPOCH = 315532800
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _HashingReader:
+    """读的同时计算摘要：tarfile.addfile 按块读取，数据只经过一次；取消时在块之间中止"""
+
+    def __init__(self, f, h, stop):
+        self.f = f
+        self.h = h
+        self.stop = stop
+
+    def read(self, n=-1):
+        if self.stop.is_set():
+            raise _Cancelled()
+        data = self.f.read(n)
+        self.h.update(data)
+        return data
+
+
+class ArchiveExporter:
+    """
+    打包导出执行器 (output_mode = archive)：按计划的目标路径把照片直接写进每个机台 (或每个文件夹) 一个的
+    ZIP / TAR，不在磁盘上落地文件夹树；原文件保留。接口与 MoveExecutor.run() 一致。
+
+    - JPEG 本身已压缩，ZIP 条目一律存储 (ZIP_STORED)，按块流式写入，不把整张照片读进内存；
+      写入的同时计算 blake2b，源数据只读一遍
+    - 同一个归档只能顺序写，不同归档之间用有界线程池并行 (max_open 个归档同时打开)
+    - 归档先写到 .part，全部条目写完才原子替换，取消或出错时整个归档丢弃；
+      每个条目写完立即以 op['provisional'] = True 回调一次 (只用于推进进度，结果未定)，
+      归档落地 (或丢弃) 后再以最终状态回调一次
+    """
+
+    def __init__(self, fmt='zip', group='rel_no', max_open=2, roots=(), durability='none', throttle=None,
+                 illegal_chars=None):
+        self.fmt = fmt if fmt in ARCHIVE_FORMATS else 'zip'
+        self.group = group if group in ARCHIVE_GROUPS else 'rel_no'
+        self.max_open = max(1, int(max_open))
+        # 输出根目录 (Regular / Issue 输出文件夹)：按机台分组时归档放在根目录下，条目路径相对根目录
+        self.roots = [os.path.abspath(r) for r in roots if r]
+        self.durability = durability
+        self.throttle = throttle
+        # 机台号用作归档文件名，与 FileProcessor 清洗数据值一样把设置里的非法字符替换为 "-"
+        if illegal_chars is None:
+            illegal_chars = DEFAULT_SETTINGS['illegal_chars']
+        self.illegal_chars = [c for c in illegal_chars if c]
+        self.last_run = None
+
+    @classmethod
+    def from_settings(cls, exec_cfg, roots=(), durability='none', throttle=None, illegal_chars=None):
+        # 同时写入的归档数沿用"每个磁盘并发数"
+        return cls(fmt=exec_cfg.get('archive_format', 'zip'), group=exec_cfg.get('archive_group', 'rel_no'),
+                   max_open=exec_cfg.get('workers_per_device', 4), roots=roots,
+                   durability=durability, throttle=throttle, illegal_chars=illegal_chars)
+
+    def options(self):
+        """写入批次清单的参数 (归档路径已按条目写入清单，继续执行时不再需要 roots)"""
+        return {'fmt': self.fmt, 'group': self.group, 'max_open': self.max_open}
+
+    @property
+    def ext(self):
+        return '.zip' if self.fmt == 'zip' else '.tar'
+
+    def _clean_name(self, text):
+        text = str(text).strip()
+        for char in self.illegal_chars:
+            text = text.replace(char, "-")
+        return text
+
+    def _root_of(self, dst):
+        for root in self.roots:
+            if os.path.normcase(dst).startswith(os.path.normcase(root) + os.sep):
+                return root
+        return os.path.dirname(dst)
+
+    def assign_archives(self, ops, dir_cache):
+        """
+        规划阶段为每项操作分配 op['archive'] (归档路径) 与 op['arcname'] (归档内路径)。
+        磁盘上已有同名归档时加后缀 (与"保留两者"相同)，不覆盖之前的交付物。
+        """
+        assigned = {}
+        for op in ops:
+            dst = os.path.abspath(op['dst'])
+            if self.group == 'folder':
+                archive = os.path.dirname(dst) + self.ext
+                arcname = os.path.basename(dst)
+            else:
+                root = self._root_of(dst)
+                rel_no = self._clean_name((op.get('parse') or {}).get('rel_no') or '') or os.path.basename(root)
+                archive = os.path.join(root, f"{rel_no}{self.ext}")
+                arcname = os.path.relpath(dst, root)
+            if archive not in assigned:
+                # 只在内存中占位，归档所在目录由写入线程在执行时创建
+                assigned[archive] = dir_cache.next_free(archive, reserve=True)
+            op['archive'] = assigned[archive]
+            op['arcname'] = arcname.replace(os.sep, '/')
+        logger.info(f"📦 {len(ops)} 个文件分配到 {len(assigned)} 个归档")
+
+    def run(self, ops, on_result=None, is_cancelled=None):
+        """
+        Args / Returns: 同 MoveExecutor.run()，ops 需已由 assign_archives 分配归档。
+        on_result 每项先以 op['provisional'] = True 触发一次 (条目已写入、归档未落地，调用方只应更新进度)，
+        最终状态确定后再以 op['provisional'] = False 触发一次；done 按首次回调计数，不会回退。
+        """
+        if not ops:
+            return ops
+
+        by_archive = {}
+        for op in ops:
+            op['action'] = 'archive'
+            by_archive.setdefault(op['archive'], []).append(op)
+        logger.info(f"📦 打包导出 {len(ops)} 项到 {len(by_archive)} 个 {self.fmt.upper()}，"
+                    f"同时写入 {min(self.max_open, len(by_archive))} 个")
+
+        run_start = time.perf_counter()
+        results = queue.Queue()
+        stop = threading.Event()
+        counted = set()
+        finished = 0
+        with ThreadPoolExecutor(max_workers=self.max_open) as pool:
+            for archive, members in by_archive.items():
+                pool.submit(self._write_archive, archive, members, results, stop)
+            # 在调用线程汇总结果并回调；等待时定期检查取消，不依赖条目写完
+            while finished < len(ops):
+                try:
+                    final, op = results.get(timeout=0.2)
+                except queue.Empty:
+                    final, op = None, None
+                if op is not None:
+                    counted.add(id(op))
+                    finished += final
+                    op['provisional'] = not final
+                    if on_result:
+                        on_result(op, len(counted), len(ops))
+                if not stop.is_set() and is_cancelled and is_cancelled():
+                    stop.set()
+
+        ok_ops = [op for op in ops if op.get('status') == 'ok']
+        self.last_run = {'files': len(ok_ops), 'bytes': sum(op['size'] for op in ok_ops),
+                         'seconds': time.perf_counter() - run_start}
+        return ops
+
+    def _write_archive(self, archive, members, results, stop):
+        """
+        在工作线程中顺序写完一个归档。每个条目写入后放入 (False, op) 作为进度，
+        归档落地或丢弃后每项再放入 (True, op) 最终结果 (无论成功与否，每项恰好一次)。
+        """
+        part = archive + ".part"
+        start = time.perf_counter()
+        error = None
+        cancelled = False
+        try:
+            os.makedirs(os.path.dirname(archive), exist_ok=True)
+            if self.fmt == 'zip':
+                writer = zipfile.ZipFile(part, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+            else:
+                writer = tarfile.open(part, 'w', format=tarfile.PAX_FORMAT)
+            with writer:
+                for op in members:
+                    if stop.is_set():
+                        raise _Cancelled()
+                    try:
+                        st = os.stat(op['src'])
+                    except OSError as e:
+                        # 单个源文件读不到只跳过这一项
+                        op['status'] = 'error'
+                        op['error'] = str(e)
+                        results.put((False, op))
+                        continue
+                    op['size'] = st.st_size
+                    op['mtime'] = st.st_mtime
+                    if self.throttle:
+                        self.throttle.acquire(st.st_size)
+                    io_start = time.perf_counter()
+                    ok = False
+                    try:
+                        op['digest'] = self._add(writer, op, st, stop)
+                        ok = True
+                    finally:
+                        if self.throttle:
+                            self.throttle.release(st.st_size, time.perf_counter() - io_start, ok=ok)
+                    results.put((False, op))
+            if self.durability != 'none':
+                fsync_path(part)
+            os.replace(part, archive)
+            if self.durability in ('files_dirs', 'per_file'):
+                fsync_dir(os.path.dirname(archive))
+        except _Cancelled:
+            cancelled = True
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"归档写入失败 {archive}: {e}")
+
+        if (cancelled or error) and os.path.exists(part):
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+        elapsed = time.perf_counter() - start
+        for op in members:
+            if cancelled:
+                op['status'] = 'cancelled'
+                op['error'] = "用户取消"
+            elif error:
+                op['status'] = 'error'
+                op['error'] = error
+            elif op.get('status') != 'error':
+                op['status'] = 'ok'
+                op['error'] = None
+            op['elapsed'] = elapsed
+            results.put((True, op))
+
+    def _add(self, writer, op, st, stop):
+        """流式写入一个条目，返回源数据的 blake2b 摘要；stop 置位时在块之间抛出 _Cancelled"""
+        h = hashlib.blake2b()
+        with open(op['src'], 'rb') as f:
+            if self.fmt == 'zip':
+                info = zipfile.ZipInfo(op['arcname'], date_time=time.localtime(max(st.st_mtime, ZIP_EPOCH))[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                info.file_size = st.st_size
+                with writer.open(info, 'w') as out:
+                    while True:
+                        if stop.is_set():
+                            raise _Cancelled()
+                        chunk = f.read(COPY_CHUNK)
+                        if not chunk:
+                            break
+                        h.update(chunk)
+                        out.write(chunk)
+            else:
+                info = tarfile.TarInfo(op['arcname'])
+                info.size = st.st_size
+                info.mtime = st.st_mtime
+                info.mode = 0o644
+                writer.addfile(info, _HashingReader(f, h, stop))
+        return h.hexdigest()
@@ -0,0 +1,268 @@
+import os
+import json
+import glob
+from datetime import datetime
+from loguru import logger
+from src.core.dir_cache import DirectoryCache
+from src.core.move_executor import MoveExecutor
+from src.core.transcoder import Transcoder
+from src.core.archive_exporter import ArchiveExporter
+from src.core.batch_undo import undo_records
+from src.core.preflight import ThroughputHistory
+from src.utils.rename_journal import RenameJournal
+from src.utils.operation_logger import get_operation_logger
+
+
+class BatchManifest:
+    """
+    进行中批次清单：执行前把最终的 src -> dst 操作列表 (含源文件大小/修改时间) 原子写入
+    journal 目录下的 pending_<batch_id>.json，批次正常结束后删除。
+    程序崩溃、断电或用户取消后清单留在磁盘上，下次启动时据此继续执行或回滚。
+    """
+
+    def __init__(self, journal_dir=None):
+        self.journal_dir = journal_dir or RenameJournal().journal_dir
+
+    def path_for(self, batch_id):
+        return os.path.join(self.journal_dir, f"pending_{batch_id}.json")
+
+    def save(self, batch_id, ops, mode='move', **meta):
+        """
+        Args:
+            ops: [{'src', 'dst', 'action'(可选), 'parse'(可选，写操作日志用), 'cold'(可选，转码),
+                   'archive' / 'arcname'(可选，打包导出)}, ...]，dst 为冲突解决后的最终路径
+        Returns: 清单文件路径
+        """
+        os.makedirs(self.journal_dir, exist_ok=True)
+        entries = []
+        for op in ops:
+            size, mtime = op.get('size'), op.get('mtime')
+            if size is None:
+                # 预检阶段没有批量取到的再单独 stat
+                try:
+                    st = os.stat(op['src'])
+                    size, mtime = st.st_size, st.st_mtime
+                except OSError:
+                    size = mtime = None
+            entry = {'src': op['src'], 'dst': op['dst'], 'action': op.get('action') or mode,
+                     'size': size, 'mtime': mtime, 'parse': op.get('parse')}
+            for key in ('cold', 'archive', 'arcname'):
+                if op.get(key):
+                    entry[key] = op[key]
+            entries.append(entry)
+
+        path = self.path_for(batch_id)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'batch_id': batch_id, 'mode': mode,
+                       'created': datetime.now().isoformat(timespec='seconds'),
+                       **meta, 'ops': entries}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        # 先写临时文件再替换，崩溃时不会留下半截清单
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def load(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def find_pending(self):
+        """所有未完成的批次清单 (按时间倒序)"""
+        return sorted(glob.glob(os.path.join(self.journal_dir, "pending_*.json")), reverse=True)
+
+    @staticmethod
+    def dst_matches(entry):
+        """
+        目标文件已存在且大小、修改时间与清单记录的源文件一致 -> 视为已完成。
+        转码的目标大小与原文件不同，但它是写完临时文件后原子替换的，存在即完成；归档同理，按归档文件判断。
+        """
+        if entry.get('size') is None:
+            return False
+        if entry.get('action') == 'archive':
+            return os.path.exists(entry['archive'])
+        try:
+            st = os.stat(entry['dst'])
+        except OSError:
+            return False
+        if entry.get('action') == 'transcode':
+            return True
+        # FAT 类文件系统的修改时间精度是 2 秒
+        return st.st_size == entry['size'] and abs(st.st_mtime - entry['mtime']) <= 2
+
+
+def inspect_manifest(path):
+    """
+    统计中断批次的进度
+    Returns: (manifest, done, remaining)，done / remaining 都是清单条目列表
+    """
+    manifest = BatchManifest.load(path)
+    done, remaining = [], []
+    for entry in manifest['ops']:
+        (done if BatchManifest.dst_matches(entry) else remaining).append(entry)
+    return manifest, done, remaining
+
+
+def resume_batch(path, workers_per_group=4, on_result=None, is_cancelled=None, durability='none', throttle=None):
+    """
+    继续执行中断的批次：目标已按大小+修改时间匹配的条目跳过，其余按原计划执行。
+    结果追加到同一个批次日志 (batch_id 不变，"撤销上一批"仍然整批生效)，并写一份新的操作日志。
+    """
+    return execute_manifest(path, workers_per_group, on_result, is_cancelled, resumed=True,
+                            durability=durability, throttle=throttle)
+
+
+def execute_manifest(path, workers_per_group=4, on_result=None, is_cancelled=None, resumed=False,
+                     durability='none', throttle=None):
+    """
+    按批次清单执行 (无界面)：新批次 (如命令行执行导出的计划) 与中断后继续共用这一流程。
+
+    Returns:
+        {'done', 'skipped', 'errors', 'cancelled', 'details', 'log_file', 'rate'}
+    """
+    manifest, done, remaining = inspect_manifest(path)
+    batch_id = manifest['batch_id']
+    journal = RenameJournal(os.path.dirname(path))
+    # 已完成但来不及写入批次日志的条目 (崩溃发生在移动和写日志之间) 补记
+    journaled = set()
+    if os.path.exists(journal.path_for(batch_id)):
+        _, records, _ = RenameJournal.read(journal.path_for(batch_id))
+        journaled = {(r['src'], r['dst']) for r in records}
+    journal.open_batch(batch_id=batch_id, mode=manifest.get('mode', 'move'), resumed=resumed)
+
+    op_logger = get_operation_logger()
+    log_file = op_logger.create_new_log_file()
+
+    dir_cache = DirectoryCache()
+    ops = []
+    details = []
+    skipped = 0
+    for entry in done:
+        if entry['action'] == 'move' and os.path.exists(entry['src']):
+            # 复制已校验落地但源文件还没删除：补完删除这一步
+            ops.append({'src': entry['src'], 'action': 'remove', 'entry': entry})
+            continue
+        extra = {}
+        target = entry['dst']
+        if entry['action'] == 'archive':
+            target = entry['archive']
+            extra['arcname'] = entry['arcname']
+        if entry['action'] == 'transcode':
+            extra['out_size'] = os.path.getsize(entry['dst'])
+            if entry.get('cold') and os.path.exists(entry['src']) and not os.path.exists(entry['cold']):
+                # 转码已落地但原文件还没移到冷存储：补完这一步
+                pending = {'src': entry['src'], 'cold': entry['cold']}
+                Transcoder(durability=durability, workers_per_group=workers_per_group, throttle=throttle,
+                           **(manifest.get('transcode') or {})).move_to_cold([pending])
+                if not pending['cold']:
+                    details.append(f"无法移到冷存储 (原文件保留): {entry['src']}")
+            if entry.get('cold') and os.path.exists(entry['cold']):
+                extra['cold'] = entry['cold']
+        if (entry['src'], target) not in journaled:
+            journal.record(entry['src'], target, entry['size'], entry['mtime'], action=entry['action'], **extra)
+        skipped += 1
+
+    for entry in remaining:
+        if not os.path.exists(entry['src']):
+            details.append(f"跳过 (源文件已不存在): {entry['src']}")
+            op_logger.log_operation_skip(entry['src'], entry['dst'], "源文件已不存在")
+            skipped += 1
+            continue
+        if entry['action'] != 'archive':
+            # 打包导出不落地文件夹树，归档所在目录由写入线程创建
+            dir_cache.ensure_dir(os.path.dirname(entry['dst']))
+        ops.append({'src': entry['src'], 'dst': entry['dst'], 'action': entry['action'], 'cold': entry.get('cold'),
+                    'archive': entry.get('archive'), 'arcname': entry.get('arcname'), 'entry': entry})
+
+    logger.info(f"{'⏯️ 继续' if resumed else '🚀 执行'}批次 {batch_id}: 已完成 {len(done)}，待执行 {len(ops)}")
+
+    errors = 0
+    if manifest.get('mode') == 'transcode':
+        # 转码批次：按清单里记录的参数用进程池转码
+        Transcoder(durability=durability, workers_per_group=workers_per_group, throttle=throttle,
+                   **(manifest.get('transcode') or {})).run(ops, on_result=on_result, is_cancelled=is_cancelled)
+    elif manifest.get('mode') == 'archive':
+        executor = ArchiveExporter(durability=durability, throttle=throttle, **(manifest.get('archive') or {}))
+        executor.run(ops, on_result=on_result, is_cancelled=is_cancelled)
+        if not throttle and executor.last_run:
+            ThroughputHistory(journal.journal_dir).record(**executor.last_run)
+    else:
+        executor = MoveExecutor(workers_per_group=workers_per_group, durability=durability, throttle=throttle)
+        executor.run(ops, on_result=on_result, is_cancelled=is_cancelled)
+        if not throttle and executor.last_run:
+            ThroughputHistory(journal.journal_dir).record(**executor.last_run)
+    for op in ops:
+        entry = op['entry']
+        if op['status'] == 'ok':
+            target, shown, extra = entry['dst'], entry['dst'], {}
+            if op['action'] == 'transcode':
+                extra = {'out_size': op['out_size'], 'cold': op.get('cold')}
+            elif op['action'] == 'archive':
+                # 批次日志里的目标是归档文件本身，撤销时删除整个归档
+                target, shown, extra = op['archive'], os.path.join(op['archive'], op['arcname']), {'arcname': op['arcname']}
+            op_logger.log_rename_success(entry['src'], shown,
+                                         entry.get('parse') or {}, action=entry['action'], digest=op.get('digest'),
+                                         sizes=(op['size'], op['out_size']) if 'out_size' in extra else None,
+                                         cold=op.get('cold'))
+            journal.record(entry['src'], target, entry['size'], entry['mtime'], action=entry['action'],
+                           digest=op.get('digest'), **extra)
+        elif op['status'] == 'error':
+            errors += 1
+            details.append(f"失败: {entry['src']}: {op['error']}")
+            op_logger.log_operation_error(entry['src'], op['error'])
+    journal.close()
+
+    cancelled = sum(1 for op in ops if op.get('status') == 'cancelled')
+    succeeded = sum(1 for op in ops if op.get('status') == 'ok')
+    op_logger.write_summary(len(manifest['ops']), succeeded, skipped + cancelled, errors, 0)
+    op_logger.close()
+
+    # 被取消时保留清单，下次还能继续
+    if not cancelled:
+        BatchManifest.remove(path)
+    return {'done': succeeded, 'skipped': skipped, 'errors': errors, 'cancelled': cancelled,
+            'details': details, 'log_file': log_file, 'rate': throttle.describe() if throttle else None}
+
+
+def rollback_batch(path, workers_per_group=4, on_result=None, is_cancelled=None, durability='none',
+                   throttle=None):
+    """
+    回滚中断的批次：只撤销已完成 (目标匹配) 的条目，未执行的条目不受影响。
+    回滚被取消或有失败时保留清单、不标记日志，下次启动仍可继续回滚 (已恢复的条目不再匹配，不会重复处理)。
+    Returns:
+        {'restored', 'skipped', 'cancelled', 'errors', 'details'}
+    """
+    manifest, done, _ = inspect_manifest(path)
+    records = []
+    for entry in done:
+        rec = {'src': entry['src'], 'dst': entry['dst'], 'size': entry['size'], 'action': entry['action']}
+        if entry['action'] == 'transcode':
+            # 转码副本的大小事先未知，不核对；原文件不在原处时从冷存储移回
+            rec.update(out_size=None, cold=entry.get('cold'))
+        if entry['action'] == 'archive':
+            rec['dst'] = entry['archive']
+        if entry['action'] == 'move' and os.path.exists(entry['src']):
+            # 源文件还没删除：按复制处理，只删除目标
+            rec['action'] = 'copy'
+        records.append(rec)
+
+    summary = undo_records(records, workers_per_group, on_result, is_cancelled, durability, throttle)
+
+    if summary['cancelled'] or summary['errors']:
+        summary['details'].append("回滚未全部完成，保留批次清单")
+    else:
+        journal_path = RenameJournal(os.path.dirname(path)).path_for(manifest['batch_id'])
+        if os.path.exists(journal_path):
+            RenameJournal.mark_undone(journal_path, {k: v for k, v in summary.items() if k != 'details'})
+        BatchManifest.remove(path)
+    logger.info(f"⏪ 回滚批次 {manifest['batch_id']}: 恢复 {summary['restored']}，"
+                f"跳过 {summary['skipped']}，取消 {summary['cancelled']}，失败 {summary['errors']}")
+    return summary
@@ -0,0 +1,158 @@
+import os
+from loguru import logger
+from src.core.dir_cache import DirectoryCache
+from src.core.move_executor import MoveExecutor
+from src.utils.rename_journal import RenameJournal
+
+
+def undo_batch(journal_path, workers_per_group=4, on_result=None, is_cancelled=None, durability='none',
+               throttle=None):
+    """
+    按日志倒序撤销一个批次 (无界面，可在脚本中直接调用)
+    使用与正向执行相同的并行执行器：move 记录把文件移回原位置，
+    copy / hardlink / reflink / transcode 记录原文件还在，只删除生成的目标文件；
+    转码后原文件移到了冷存储的，先把原文件移回，移回成功后再删除转码副本；
+    打包导出的记录 dst 是归档文件，同一归档的所有原文件都还在时整个删除。
+
+    取消或有失败时批次不标记为已撤销，"撤销上一批"仍会指向它，再次撤销时已恢复的文件按"目标已不存在"跳过。
+
+    Returns:
+        {'restored', 'skipped', 'cancelled', 'errors', 'details'}
+    """
+    header, records, undone = RenameJournal.read(journal_path)
+    if undone:
+        logger.warning(f"批次已撤销过: {journal_path}")
+        return {'restored': 0, 'skipped': 0, 'cancelled': 0, 'errors': 0, 'details': ["该批次已撤销过"]}
+
+    summary = undo_records(records, workers_per_group, on_result, is_cancelled, durability, throttle)
+    if summary['cancelled'] or summary['errors']:
+        summary['details'].append("撤销未全部完成，批次保留为可撤销")
+    else:
+        RenameJournal.mark_undone(journal_path, {k: v for k, v in summary.items() if k != 'details'})
+    logger.info(f"↩️ 撤销批次 {header.get('batch_id')}: 恢复 {summary['restored']}，"
+                f"跳过 {summary['skipped']}，取消 {summary['cancelled']}，失败 {summary['errors']}")
+    return summary
+
+
+def undo_records(records, workers_per_group=4, on_result=None, is_cancelled=None, durability='none',
+                 throttle=None):
+    """
+    倒序撤销一组 {'src', 'dst', 'size', 'action', 'out_size'(转码), 'cold'(转码)} 记录
+    (批次日志或中断批次清单中已完成的部分)
+    按记录计数：一条记录的任一步失败算失败，否则任一步被取消算取消；删除一个归档按其中的条目数计数。
+    Returns:
+        {'restored', 'skipped', 'cancelled', 'errors', 'details'}
+    """
+    dir_cache = DirectoryCache()
+    ops = []
+    details = []
+    archive_members = {}
+    for rec in records:
+        if rec.get('action') == 'archive':
+            archive_members.setdefault(rec['dst'], []).append(rec)
+
+    for rec in reversed(records):
+        src, dst = rec['src'], rec['dst']
+        if rec.get('action') == 'archive':
+            members = archive_members.pop(dst, None)
+            if members is None:
+                # 同一归档已经处理过
+                continue
+            if not dir_cache.exists(dst):
+                details.append(f"跳过 (归档已不存在): {dst}")
+                continue
+            if not all(dir_cache.exists(r['src']) for r in members):
+                details.append(f"跳过 (部分原文件已不存在，保留归档): {dst}")
+                continue
+            ops.append({'src': dst, 'action': 'remove', 'record': rec, 'members': len(members)})
+            continue
+
+        # 1. 目标已不在 (被手动挪走/删掉)
+        if not dir_cache.exists(dst):
+            details.append(f"跳过 (目标已不存在): {dst}")
+            continue
+        # 2. 文件在归档后被修改过，不动它 (转码的目标与原文件大小不同，按输出大小核对)
+        expected = rec.get('out_size') if rec.get('action') == 'transcode' else rec.get('size')
+        if expected is not None and os.path.getsize(dst) != expected:
+            details.append(f"跳过 (文件大小已变化): {dst}")
+            continue
+
+        cold = rec.get('cold')
+        if rec.get('action') == 'transcode' and cold and not dir_cache.exists(rec['src']):
+            # 原文件在冷存储：移回原位置，再删除转码副本
+            if not os.path.exists(cold):
+                details.append(f"跳过 (冷存储中的原文件已不存在，保留副本): {dst}")
+                continue
+            dir_cache.ensure_dir(os.path.dirname(src))
+            dir_cache.add(src)
+            ops.append({'src': cold, 'dst': src, 'action': 'move', 'record': rec, 'then_remove': dst})
+            continue
+
+        if rec.get('action', 'move') != 'move':
+            # 复制类操作：原文件必须还在，才允许删除副本
+            if not dir_cache.exists(src):
+                details.append(f"跳过 (原文件已不存在，保留副本): {dst}")
+                continue
+            ops.append({'src': dst, 'action': 'remove', 'record': rec})
+            continue
+
+        # 3. 原位置已被占用，不覆盖
+        if dir_cache.exists(src):
+            details.append(f"跳过 (原位置已有文件): {src}")
+            continue
+
+        dir_cache.ensure_dir(os.path.dirname(src))
+        dir_cache.add(src)
+        ops.append({'src': dst, 'dst': src, 'action': 'move', 'record': rec})
+
+    executor = MoveExecutor(workers_per_group=workers_per_group, durability=durability, throttle=throttle)
+    total = len(ops) + sum(1 for op in ops if op.get('then_remove'))
+
+    def report(offset):
+        def callback(op, done, _):
+            if on_result:
+                on_result(op, offset + done, total)
+        return callback
+
+    executor.run(ops, on_result=report(0), is_cancelled=is_cancelled)
+
+    # 原文件确实移回原位置之后，才删除对应的转码副本 (移回失败或被取消时副本保留)
+    removals = [{'src': op['then_remove'], 'action': 'remove', 'record': op['record']}
+                for op in ops if op.get('then_remove') and op.get('status') == 'ok']
+    if removals:
+        if is_cancelled and is_cancelled():
+            for op in removals:
+                op['status'] = 'cancelled'
+        else:
+            executor.run(removals, on_result=report(len(ops)), is_cancelled=is_cancelled)
+        ops.extend(removals)
+
+    failed = [op for op in ops if op.get('status') == 'error']
+    details.extend(f"失败: {op['src']} -> {op.get('dst', '(删除)')}: {op['error']}" for op in failed)
+
+    outcome = {}
+    for op in ops:
+        state = outcome.setdefault(id(op['record']), {'status': 'ok', 'count': op.get('members', 1)})
+        if op.get('status') == 'error':
+            state['status'] = 'error'
+        elif op.get('status') != 'ok' and state['status'] == 'ok':
+            state['status'] = 'cancelled'
+    counts = {'ok': 0, 'cancelled': 0, 'error': 0}
+    for state in outcome.values():
+        counts[state['status']] += state['count']
+    summary = {
+        'restored': counts['ok'],
+        'skipped': len(records) - sum(counts.values()),
+        'cancelled': counts['cancelled'],
+        'errors': counts['error'],
+        'details': details,
+    }
+    return summary
+
+
+def undo_last_batch(journal_dir=None, **kwargs):
+    """撤销最近一个尚未撤销的批次，没有可撤销的批次时返回 None"""
+    path = RenameJournal(journal_dir).find_last_batch()
+    if not path:
+        return None
+    return undo_batch(path, **kwargs)
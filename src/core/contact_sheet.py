@@ -0,0 +1,147 @@
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
+from src.utils.file_cache import FileCache
+from src.utils.constants import SUPPORTED_IMAGE_FORMATS
+
+# 每个目标文件夹里生成的预览图文件名 (扫描文件夹时排除自身)
+SHEET_NAME = "_ContactSheet.jpg"
+
+THUMB_SIZE = 240
+COLUMNS = 6
+LABEL_HEIGHT = 22
+PADDING = 8
+
+
+def render_sheet(folder, entries, thumb_size=THUMB_SIZE, columns=COLUMNS):
+    """
+    在子进程中运行：把 entries [(文件名, 标签), ...] 按网格拼成一张 JPEG，写到 folder/SHEET_NAME。
+    JPEG 用 draft 模式按缩小比例解码，并按 EXIF 方向摆正。
+    返回 (folder, 成功拼入的张数, 错误信息 或 None)
+    """
+    try:
+        from PIL import Image, ImageDraw, ImageOps
+        columns = max(1, min(columns, len(entries)))
+        rows = (len(entries) + columns - 1) // columns
+        cell_w = thumb_size + PADDING
+        cell_h = thumb_size + LABEL_HEIGHT + PADDING
+        sheet = Image.new('RGB', (columns * cell_w + PADDING, rows * cell_h + PADDING), (255, 255, 255))
+        draw = ImageDraw.Draw(sheet)
+
+        count = 0
+        for n, (name, label) in enumerate(entries):
+            x = PADDING + (n % columns) * cell_w
+            y = PADDING + (n // columns) * cell_h
+            try:
+                with Image.open(os.path.join(folder, name)) as im:
+                    im.draft('RGB', (thumb_size, thumb_size))
+                    im = ImageOps.exif_transpose(im)
+                    im.thumbnail((thumb_size, thumb_size))
+                    thumb = im.convert('RGB')
+            except Exception:
+                draw.rectangle([x, y, x + thumb_size - 1, y + thumb_size - 1], outline=(211, 47, 47))
+                draw.text((x + 6, y + 6), "unreadable", fill=(211, 47, 47))
+            else:
+                sheet.paste(thumb, (x + (thumb_size - thumb.width) // 2, y + (thumb_size - thumb.height) // 2))
+                count += 1
+            try:
+                draw.text((x, y + thumb_size + 4), label[:40], fill=(30, 30, 30))
+            except UnicodeError:
+                # 内置位图字体只支持 Latin-1
+                draw.text((x, y + thumb_size + 4), label[:40].encode('latin-1', 'replace').decode('latin-1'),
+                          fill=(30, 30, 30))
+
+        tmp = os.path.join(folder, SHEET_NAME + ".tmp")
+        sheet.save(tmp, 'JPEG', quality=85)
+        os.replace(tmp, os.path.join(folder, SHEET_NAME))
+        return folder, count, None
+    except Exception as e:
+        return folder, 0, str(e)
+
+
+def scan_folder(folder):
+    """
+    列出文件夹里的照片，返回 (按文件名排序的 [文件名, ...], 内容指纹)。
+    指纹由 (文件名, 大小, 修改时间) 算出，文件增删改后会变化。
+    """
+    names = []
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with os.scandir(folder) as it:
+            entries = sorted((e for e in it if e.is_file() and e.name != SHEET_NAME
+                              and e.name.lower().endswith(SUPPORTED_IMAGE_FORMATS)), key=lambda e: e.name)
+            for entry in entries:
+                st = entry.stat()
+                names.append(entry.name)
+                h.update(f"{entry.name}|{st.st_size}|{st.st_mtime_ns}\n".encode('utf-8'))
+    except OSError:
+        return [], None
+    return names, h.hexdigest()
+
+
+class ContactSheetBuilder:
+    """
+    每个目标文件夹 (如 {Test}/{Config}/{No}_{SN}) 生成一张缩略图总览，方便审核人不逐个打开文件夹。
+    在进程池中并行渲染；文件夹内容指纹与上次生成时相同则跳过。
+    各照片的标签 (CP / 方向) 按文件夹记在缓存里，后续批次追加照片时旧照片的标签不会丢。
+    """
+
+    def __init__(self, workers=None, cache=None):
+        self.workers = workers or os.cpu_count() or 2
+        self.cache = cache or FileCache('contact_sheets')
+
+    def build(self, labels, on_progress=None, is_cancelled=None):
+        """
+        Args:
+            labels: {目标文件完整路径: 标签}，本批落地的照片
+        Returns:
+            {'built': 生成的张数, 'skipped': 未变化跳过的文件夹数, 'errors': [(folder, 错误信息), ...]}
+        """
+        by_folder = {}
+        for path, label in labels.items():
+            by_folder.setdefault(os.path.dirname(path), {})[os.path.basename(path)] = label
+
+        jobs = []
+        skipped = 0
+        for folder, new_labels in by_folder.items():
+            key = os.path.normcase(os.path.abspath(folder))
+            names, fingerprint = scan_folder(folder)
+            if not names:
+                continue
+            state = self.cache.get(key) or {}
+            if state.get('fingerprint') == fingerprint and os.path.exists(os.path.join(folder, SHEET_NAME)):
+                skipped += 1
+                continue
+            known = state.get('labels', {})
+            known.update(new_labels)
+            known = {name: known[name] for name in names if name in known}
+            entries = [(name, known.get(name) or os.path.splitext(name)[0]) for name in names]
+            jobs.append((folder, key, entries, {'fingerprint': fingerprint, 'labels': known}))
+
+        built = 0
+        errors = []
+        if on_progress:
+            on_progress(0, len(jobs))
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(render_sheet, folder, entries): (key, state)
+                           for folder, key, entries, state in jobs}
+                for done, fut in enumerate(as_completed(futures), 1):
+                    folder, count, error = fut.result()
+                    key, state = futures[fut]
+                    if error:
+                        errors.append((folder, error))
+                        logger.warning(f"生成缩略图总览失败 {folder}: {error}")
+                    else:
+                        self.cache.set(key, state)
+                        built += 1
+                    if on_progress:
+                        on_progress(done, len(jobs))
+                    if is_cancelled and is_cancelled():
+                        for f in futures:
+                            f.cancel()
+                        break
+            self.cache.save()
+        logger.info(f"🗂️ 缩略图总览: 生成 {built} 个文件夹，未变化跳过 {skipped} 个")
+        return {'built': built, 'skipped': skipped, 'errors': errors}
@@ -0,0 +1,83 @@
+import os
+import threading
+
+
+class DirectoryCache:
+    """
+    单批次内的目录列表缓存：每个目标目录只用 os.scandir 列一次，
+    之后的"是否存在"、"保留两者"的下一个可用后缀都在内存中回答，
+    文件落地后同步更新缓存。网络共享盘上可省掉大量 stat 往返。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs = {}        # 目录 Key -> {文件名 Key}
+        self._missing = set()  # 列目录时发现不存在的目录 Key
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.normpath(path))
+
+    def _listing(self, dir_path):
+        """返回目录内容集合 (调用方需持有锁)"""
+        key = self._key(dir_path)
+        names = self._dirs.get(key)
+        if names is None:
+            try:
+                with os.scandir(dir_path) as it:
+                    names = {os.path.normcase(e.name) for e in it}
+            except (FileNotFoundError, NotADirectoryError):
+                names = set()
+                self._missing.add(key)
+            self._dirs[key] = names
+        return names
+
+    def list_names(self, dir_path):
+        with self._lock:
+            return set(self._listing(dir_path))
+
+    def ensure_dir(self, dir_path):
+        """目录不存在时创建，每个目录只会真正调用一次 makedirs"""
+        with self._lock:
+            self._listing(dir_path)
+            key = self._key(dir_path)
+            if key not in self._missing:
+                return
+            os.makedirs(dir_path, exist_ok=True)
+            self._missing.discard(key)
+
+    def exists(self, path):
+        with self._lock:
+            names = self._listing(os.path.dirname(path))
+            return os.path.normcase(os.path.basename(path)) in names
+
+    def next_free(self, path, reserve=False):
+        """
+        "保留两者"：返回 path 本身或第一个未被占用的 name_1.ext / name_2.ext ...
+        reserve=True 时立即占位，防止并发时两个文件拿到同一个后缀。
+        """
+        with self._lock:
+            names = self._listing(os.path.dirname(path))
+            final = path
+            base, ext = os.path.splitext(path)
+            counter = 1
+            while os.path.normcase(os.path.basename(final)) in names:
+                final = f"{base}_{counter}{ext}"
+                counter += 1
+            if reserve:
+                names.add(os.path.normcase(os.path.basename(final)))
+            return final
+
+    def add(self, path):
+        """文件落地后登记"""
+        with self._lock:
+            key = self._key(os.path.dirname(path))
+            if key in self._dirs:
+                self._dirs[key].add(os.path.normcase(os.path.basename(path)))
+
+    def discard(self, path):
+        """文件被移走后注销"""
+        with self._lock:
+            key = self._key(os.path.dirname(path))
+            if key in self._dirs:
+                self._dirs[key].discard(os.path.normcase(os.path.basename(path)))
@@ -0,0 +1,96 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from src.core.preflight import stat_sources
+from src.core.move_executor import MoveExecutor
+
+# 部分哈希读取文件头、尾各多少字节
+PARTIAL_BYTES = 64 * 1024
+
+
+class DuplicateFinder:
+    """
+    按内容查找完全相同的照片 (不同卡、不同文件名导入的同一张)：
+      1. 按文件大小分组 —— 大小唯一的文件直接排除，不读任何数据
+      2. 大小相同的再比较部分哈希 (文件头 + 文件尾各 64KB)
+      3. 部分哈希仍相同的才计算整文件 blake2b
+    2、3 两步在线程池里并行；摘要按 (路径, 大小, 修改时间) 缓存，重复检查时不再读盘。
+    """
+
+    def __init__(self, workers=8):
+        self.workers = max(1, int(workers))
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def find(self, paths):
+        """
+        Returns:
+            重复组列表 [[path, path, ...], ...]，每组按 paths 中的先后顺序排列 (第一个视为原件)
+        """
+        order = {p: i for i, p in enumerate(paths)}
+        ops = stat_sources([{'src': p} for p in paths])
+
+        # 1. 按大小分组 (空文件不参与)
+        by_size = {}
+        for op in ops:
+            if op['size']:
+                by_size.setdefault(op['size'], []).append(op)
+        candidates = [group for group in by_size.values() if len(group) > 1]
+        if not candidates:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # 2. 部分哈希
+            groups = self._split(pool, candidates, 'partial')
+            # 3. 整文件哈希 (不超过 2 × 64KB 的文件部分哈希已经覆盖全文)
+            small = [g for g in groups if g[0]['size'] <= 2 * PARTIAL_BYTES]
+            large = [g for g in groups if g[0]['size'] > 2 * PARTIAL_BYTES]
+            groups = small + self._split(pool, large, 'full')
+
+        result = [sorted((op['src'] for op in g), key=order.get) for g in groups]
+        result.sort(key=lambda g: order[g[0]])
+        if result:
+            logger.info(f"🔁 发现 {len(result)} 组重复照片，共 {sum(len(g) - 1 for g in result)} 个重复文件")
+        return result
+
+    def _split(self, pool, groups, kind):
+        """按某种摘要把每个候选组再细分，只保留仍有 2 个以上成员的子组"""
+        flat = [op for g in groups for op in g]
+        digests = pool.map(lambda op: self._digest(op, kind), flat)
+        buckets = {}
+        for op, digest in zip(flat, digests):
+            if digest is not None:
+                buckets.setdefault((op['size'], digest), []).append(op)
+        return [g for g in buckets.values() if len(g) > 1]
+
+    def _digest(self, op, kind):
+        key = (op['src'], op['size'], op['mtime'], kind)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            if kind == 'partial':
+                digest = self.partial_digest(op['src'], op['size'])
+            else:
+                digest = MoveExecutor.file_digest(op['src'])
+        except OSError as e:
+            logger.warning(f"读取失败，跳过查重: {op['src']}: {e}")
+            return None
+        with self._lock:
+            self._cache[key] = digest
+        return digest
+
+    @staticmethod
+    def partial_digest(path, size):
+        h = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            h.update(f.read(PARTIAL_BYTES))
+            if size > 2 * PARTIAL_BYTES:
+                f.seek(-PARTIAL_BYTES, os.SEEK_END)
+                h.update(f.read(PARTIAL_BYTES))
+            elif size > PARTIAL_BYTES:
+                h.update(f.read())
+        return h.hexdigest()
@@ -1,120 +1,444 @@
-import pandas as pd
+import os
 import re
+import sys
+import pandas as pd
 from loguru import logger
 
 
+class ColumnStore:
+    """
+    按列存储的行数据：每列一个 list，字符串全部 intern，
+    行用整数 row id 表示，比每行一个 dict 省得多。
+    """
+
+    def __init__(self, columns, header_map):
+        # 空表头列忽略
+        self.columns = [c for c in columns if c]
+        self.col_pos = {c: i for i, c in enumerate(self.columns)}
+        self.data = [[] for _ in self.columns]
+        # 已释放的 row id (增量重载摘除的旧行)，追加新行时优先复用，存储不会随重载次数增长
+        self._free = []
+        # 源表中每个位置对应的存储列 (空表头为 None)
+        self._src_slots = [self.col_pos[c] if c else None for c in columns]
+
+        # 标准键 (Build, Test 等) 直接指向对应的列，不再复制一份
+        self.alias = {}
+        for std_key, excel_key in header_map.items():
+            self.alias[std_key] = self.col_pos.get(excel_key.strip())
+        self.keys = self.columns + [k for k in self.alias if k not in self.col_pos]
+
+    def append(self, values):
+        reuse = bool(self._free)
+        rid = self._free.pop() if reuse else (len(self.data[0]) if self.data else 0)
+        for i, slot in enumerate(self._src_slots):
+            if slot is None:
+                continue
+            val = sys.intern(str(values[i] if i < len(values) else "").strip())
+            if reuse:
+                self.data[slot][rid] = val
+            else:
+                self.data[slot].append(val)
+        return rid
+
+    def release(self, rid):
+        """释放一行：清空各列的值 (不再引用旧字符串)，row id 留给下一次 append"""
+        for col in self.data:
+            col[rid] = ""
+        self._free.append(rid)
+
+    def get(self, rid, key, default=None):
+        # 标准键优先 (与旧版"注入标准键会覆盖同名列"的行为一致)
+        if key in self.alias:
+            pos = self.alias[key]
+            return self.data[pos][rid] if pos is not None else "UNKNOWN"
+        pos = self.col_pos.get(key)
+        if pos is None:
+            return default
+        return self.data[pos][rid]
+
+
+class RowView:
+    """
+    一行数据的轻量视图，只持有 (store, row id)，对外提供 dict 风格的 .get() 接口
+    """
+    __slots__ = ('store', 'rid')
+
+    def __init__(self, store, rid):
+        self.store = store
+        self.rid = rid
+
+    def get(self, key, default=None):
+        return self.store.get(self.rid, key, default)
+
+    def __getitem__(self, key):
+        val = self.store.get(self.rid, key, KeyError)
+        if val is KeyError:
+            raise KeyError(key)
+        return val
+
+    def __contains__(self, key):
+        return key in self.store.alias or key in self.store.col_pos
+
+    def __iter__(self):
+        return iter(self.store.keys)
+
+    def __len__(self):
+        return len(self.store.keys)
+
+    def __bool__(self):
+        return True
+
+    def keys(self):
+        return list(self.store.keys)
+
+    def items(self):
+        return [(k, self.get(k)) for k in self.store.keys]
+
+    def copy(self):
+        """物化为普通 dict (需要修改数据时使用)"""
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return isinstance(other, RowView) and other.store is self.store and other.rid == self.rid
+
+    def __hash__(self):
+        return hash((id(self.store), self.rid))
+
+    def __repr__(self):
+        return f"RowView({self.copy()!r})"
+
+
 class ExcelEngine:
+    # 支持直接读取的 Excel 格式 (openpyxl)
+    XLSX_EXTS = ('.xlsx', '.xlsm')
+    # 表头探测：最多向下扫描多少行寻找表头
+    HEADER_SCAN_ROWS = 30
+
     def __init__(self):
         self.df = None
-        # 查找字典：RelNo (纯数字/原始值) -> [RowData1, RowData2...]
+        self.loaded_path = None
+        self.sheet_name = None
+        self.row_count = 0
+        self._signature = None
+        self._unit_hashes = {}
+        self._unit_rows = {}
+        # 列式行存储，索引里只放 row id
+        self.store = None
+        # 查找字典：规范 Key (int 机台号 / 忽略大小写的原始字符串) -> [row_id1, row_id2...]
         self.lookup_map = {}
+        # 复合索引：(规范 Key, Test 分量) -> row id，多 Test 机台可直接定位到对应行
+        self.test_index = {}
+        # 规范 Key -> 该机台所有 Test 分量 (含 "A+B" 整体及拆分后的 A、B)
+        self.scope_map = {}
+
+    def is_loaded(self):
+        return self.loaded_path is not None
 
-    def load_excel(self, path, header_map):
+    def load_excel(self, path, header_map, sheet_name=None):
         """
-        加载 CSV 文件并建立智能索引
+        加载 CSV / XLSX 文件并建立智能索引
         """
+        ok, msg, _ = self._load(path, header_map, sheet_name, incremental=False)
+        return ok, msg
+
+    def reload_excel(self, path, header_map, sheet_name=None):
+        """
+        增量重载：与上次加载的逐行哈希比对，只重建新增/修改/删除的机台。
+        返回 (ok, msg, changed_keys)，changed_keys 为 None 表示做了全量重建
+        (首次加载、换了文件/工作表/表头映射)。
+        """
+        return self._load(path, header_map, sheet_name, incremental=True)
+
+    def _load(self, path, header_map, sheet_name, incremental):
         try:
-            # 1. 读取 CSV (尝试多种编码，防止乱码)
+            # 1. 获取 Rel No 列名
+            rel_col_name = self._resolve_rel_col(header_map)
+
+            # 2. 按扩展名选择读取方式，统一输出 (表头, 行迭代器)
+            ext = os.path.splitext(path)[1].lower()
+            self.df = None
+            self.sheet_name = None
+            if ext in self.XLSX_EXTS:
+                workbook, columns, rows = self._open_xlsx(path, rel_col_name, sheet_name)
+            else:
+                workbook = None
+                columns, rows = self._read_csv(path)
+
             try:
-                self.df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8')
-            except UnicodeDecodeError:
-                logger.warning("UTF-8 解码失败，尝试 GBK...")
-                self.df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='gbk')
-
-            # 2. 清理表头：去除空格
-            self.df.columns = self.df.columns.str.strip()
-
-            # 3. 获取 Rel No 列名
-             #这里定义可能的rel no的表头写法
-            possible_keys = ["Rel No.", "Rel No", "Rel#", "Rel", "No#"]
-            rel_col_name = None
-            for key in possible_keys:
-                if key in header_map:
-                    rel_col_name = header_map[key].strip()
-                    break
-
-            if rel_col_name is None:
-                # 如果都没有找到，使用默认值
-                rel_col_name = "No#"
-
-
-            # 4. 验证列是否存在
-            if rel_col_name not in self.df.columns:
-                logger.error(f"列名 '{rel_col_name}' 不存在！CSV 列名: {self.df.columns.tolist()}")
-                return False, f"找不到列: {rel_col_name}"
-
-            # 5. 建立智能索引
-            self.lookup_map = {}
-            count = 0
-
-            for idx, row in self.df.iterrows():
-                # 获取原始机台号 (例如 "rel4817", "no.4088", "154")
-                raw_val = str(row[rel_col_name]).strip()
-
-                if not raw_val or raw_val.lower() in ['nan', '']:
-                    continue
-
-                # 生成所有可能的 Key
-                keys_to_add = set()
-                keys_to_add.add(raw_val)  # 1. 添加原始值
-
-                # 2. 提取纯数字作为通用 Key (V4.0 核心优化)
-                # 这样文件名里的 "4817" 就能找到 CSV 里的 "rel4817"
-                nums = re.findall(r'\d+', raw_val)
-                if nums:
-                    # 通常取最长的一段数字作为核心 ID
-                    core_num = max(nums, key=len)
-                    keys_to_add.add(core_num)  # "4817"
-                    keys_to_add.add(core_num.zfill(4))  # "0065" (如果数字短)
-                    keys_to_add.add(str(int(core_num)))  # "65" (去零)
-
-                # 准备行数据
-                row_data = row.to_dict()
-                # 注入标准键 (Build, Test 等)
-                for std_key, excel_key in header_map.items():
-                    clean_k = excel_key.strip()
-                    val = str(row_data.get(clean_k, "UNKNOWN")).strip()
-                    row_data[std_key] = val
-
-                # === 存入字典 ===
-                for k in keys_to_add:
-                    if k not in self.lookup_map:
-                        self.lookup_map[k] = []
-                    # 避免同一行重复添加
-                    if row_data not in self.lookup_map[k]:
-                        self.lookup_map[k].append(row_data)
-
-                    # 调试日志
-                    # if "154" in k:
-                    #     logger.debug(f"索引绑定: Key={k} -> Test={row_data.get('Test')}")
-
-                count += 1
-
-            logger.info(f"✅ CSV 加载完毕。有效行数: {count}。索引库大小: {len(self.lookup_map)}")
-            return True, f"加载成功: {count} 行"
+                # 3. 验证列是否存在
+                if rel_col_name not in columns:
+                    logger.error(f"列名 '{rel_col_name}' 不存在！表头: {columns}")
+                    return False, f"找不到列: {rel_col_name}", None
+
+                # 4. 流式建立索引 (同文件同结构时走增量)
+                signature = (path, self.sheet_name, tuple(columns), tuple(sorted(header_map.items())))
+                if incremental and signature == self._signature:
+                    changed_keys = self._patch_index(columns, rows, rel_col_name, header_map)
+                else:
+                    self._build_index(columns, rows, rel_col_name, header_map)
+                    changed_keys = None
+            finally:
+                # read_only 模式下工作簿持有文件句柄，必须显式关闭
+                if workbook is not None:
+                    workbook.close()
+                # 数据已进入列式存储，不再保留 DataFrame
+                self.df = None
+
+            self._signature = signature
+            self.loaded_path = path
+            self.row_count = sum(len(h) for h in self._unit_hashes.values())
+            if changed_keys is None:
+                logger.info(f"✅ 数据表加载完毕。有效行数: {self.row_count}。索引库大小: {len(self.lookup_map)}")
+                return True, f"加载成功: {self.row_count} 行", None
+
+            logger.info(f"♻️ 增量重载完毕。变更 Key: {len(changed_keys)}。索引库大小: {len(self.lookup_map)}")
+            return True, f"增量重载: {len(changed_keys)} 个 Key 变更", changed_keys
 
         except Exception as e:
             import traceback
             logger.error(traceback.format_exc())
-            return False, str(e)
+            return False, str(e), None
+
+    def _resolve_rel_col(self, header_map):
+        # 这里定义可能的rel no的表头写法
+        possible_keys = ["Rel No.", "Rel No", "Rel#", "Rel", "No#"]
+        for key in possible_keys:
+            if key in header_map:
+                return header_map[key].strip()
+        # 如果都没有找到，使用默认值
+        return "No#"
+
+    def _read_csv(self, path):
+        """读取 CSV (尝试多种编码，防止乱码)，返回 (表头, 行迭代器)"""
+        try:
+            self.df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8')
+        except UnicodeDecodeError:
+            logger.warning("UTF-8 解码失败，尝试 GBK...")
+            self.df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='gbk')
+
+        # 清理表头：去除空格
+        self.df.columns = self.df.columns.str.strip()
+        return self.df.columns.tolist(), self.df.itertuples(index=False, name=None)
+
+    def _open_xlsx(self, path, rel_col_name, sheet_name=None):
+        """
+        以 read_only 模式打开工作簿，返回 (workbook, 表头, 数据行迭代器)
+        行迭代器是惰性的，不会把整个工作簿读进内存。
+        """
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            if sheet_name:
+                if sheet_name not in wb.sheetnames:
+                    raise ValueError(f"工作表 '{sheet_name}' 不存在！可用: {wb.sheetnames}")
+                candidates = [sheet_name]
+            else:
+                # 未指定工作表：优先当前活动表，再依次尝试其余表
+                active = wb.active.title if wb.active is not None else None
+                candidates = ([active] if active else []) + [s for s in wb.sheetnames if s != active]
+
+            for name in candidates:
+                ws = wb[name]
+                row_iter = ws.iter_rows(values_only=True)
+                columns = self._detect_header(row_iter, rel_col_name)
+                if columns is not None:
+                    self.sheet_name = name
+                    logger.info(f"📗 使用工作表 '{name}'")
+                    rows = ([self._cell_to_str(v) for v in r] for r in row_iter)
+                    return wb, columns, rows
+
+            raise ValueError(f"在前 {self.HEADER_SCAN_ROWS} 行内未找到包含 '{rel_col_name}' 的表头行")
+        except Exception:
+            wb.close()
+            raise
+
+    def _detect_header(self, row_iter, rel_col_name):
+        """
+        在前 HEADER_SCAN_ROWS 行中寻找包含 Rel No 列名的行作为表头。
+        找到后 row_iter 停在表头之后，可直接继续读取数据行。
+        """
+        for _, raw in zip(range(self.HEADER_SCAN_ROWS), row_iter):
+            columns = [self._cell_to_str(v) for v in raw]
+            if rel_col_name in columns:
+                return columns
+        return None
+
+    @staticmethod
+    def _cell_to_str(value):
+        if value is None:
+            return ""
+        # Excel 里的整数会被读成 float (65.0)，还原为 "65"
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).strip()
+
+    def _iter_units(self, columns, rows, rel_col_name):
+        """逐行产出 (原始机台号, 行哈希, 行值)，跳过空机台号"""
+        width = len(columns)
+        rel_idx = columns.index(rel_col_name)
+
+        for values in rows:
+            values = tuple(values)
+            if len(values) < width:
+                values = values + ("",) * (width - len(values))
+
+            # 获取原始机台号 (例如 "rel4817", "no.4088", "154")
+            raw_val = str(values[rel_idx]).strip()
+
+            if not raw_val or raw_val.lower() in ['nan', '']:
+                continue
+
+            yield raw_val, hash(values), values
+
+    def _build_index(self, columns, rows, rel_col_name, header_map):
+        """
+        从 (表头, 行迭代器) 全量建立智能索引，CSV 与 XLSX 共用
+        """
+        self.lookup_map = {}
+        self.test_index = {}
+        self.scope_map = {}
+        self.store = ColumnStore(columns, header_map)
+        # 增量重载的比对基线：原始机台号 -> [行哈希...] / [row id...]
+        self._unit_hashes = {}
+        self._unit_rows = {}
+
+        for raw_val, row_hash, values in self._iter_units(columns, rows, rel_col_name):
+            rid = self.store.append(values)
+            self._unit_hashes.setdefault(raw_val, []).append(row_hash)
+            self._unit_rows.setdefault(raw_val, []).append(rid)
+            self._index_row(raw_val, rid)
+
+    def _patch_index(self, columns, rows, rel_col_name, header_map):
+        """
+        与上次加载的逐行哈希比对，只重建有变化的机台，返回变更的规范 Key 集合。
+        变化机台的旧行先释放、新行复用这些 row id，未变化机台的 row id 保持不变；
+        持有变化机台旧 RowView 的列表行会按返回的 Key 重新解析。
+        """
+        new_hashes = {}
+        new_values = {}
+        for raw_val, row_hash, values in self._iter_units(columns, rows, rel_col_name):
+            new_hashes.setdefault(raw_val, []).append(row_hash)
+            new_values.setdefault(raw_val, []).append(values)
+
+        changed_units = {raw for raw in new_hashes.keys() | self._unit_hashes.keys()
+                         if new_hashes.get(raw) != self._unit_hashes.get(raw)}
+
+        changed_keys = set()
+        for raw_val in changed_units:
+            # 1. 摘除旧行
+            for rid in self._unit_rows.pop(raw_val, []):
+                self._unindex_row(raw_val, rid)
+                self.store.release(rid)
+            self._unit_hashes.pop(raw_val, None)
+
+            # 2. 写入新行 (机台被删除时跳过)
+            if raw_val in new_hashes:
+                self._unit_hashes[raw_val] = new_hashes[raw_val]
+                self._unit_rows[raw_val] = []
+                for values in new_values[raw_val]:
+                    rid = self.store.append(values)
+                    self._unit_rows[raw_val].append(rid)
+                    self._index_row(raw_val, rid)
+
+            changed_keys.add(self.canonical_key(raw_val))
+
+        return changed_keys
+
+    @staticmethod
+    def canonical_key(value):
+        """
+        机台号的数字规范 Key，建索引和查询两侧共用：
+        含数字 -> 最长一段数字转 int ("rel4817" / "4817" / "04817" -> 4817，位数不限)
+        不含数字 -> 去空格后的原始字符串
+        """
+        raw = str(value).strip()
+        nums = re.findall(r'\d+', raw)
+        if nums:
+            # 通常取最长的一段数字作为核心 ID
+            return int(max(nums, key=len))
+        return raw
+
+    @classmethod
+    def index_keys(cls, value):
+        """
+        一个机台号写入索引的 Key：数字 Key，另加去空格、忽略大小写的原始字符串 Key
+        (纯数字的机台号只用数字 Key，补零写法 0065 / 065 本来就应该归到一起)。
+        原始 Key 让 "A12" 与 "B12" 这类数字相同、其他字符不同的编号能区分开。
+        """
+        key = cls.canonical_key(value)
+        raw = str(value).strip().casefold()
+        if isinstance(key, int) and not raw.isdigit():
+            return (raw, key)
+        return (key,)
+
+    def _resolve_key(self, rel_no):
+        """查询用的 Key：原始字符串命中时优先，否则退回数字 Key (最多两次字典查找)"""
+        keys = self.index_keys(rel_no)
+        if len(keys) > 1 and keys[0] in self.lookup_map:
+            return keys[0]
+        return keys[-1]
+
+    @staticmethod
+    def split_tests(test_str):
+        """Test 字段拆分为分量: "A + B" -> {"A + B", "A", "B"}"""
+        test_str = str(test_str).strip()
+        parts = {test_str}
+        if '+' in test_str:
+            parts.update(p.strip() for p in test_str.split('+') if p.strip())
+        return parts
+
+    def _index_row(self, raw_val, rid):
+        comps = self.split_tests(self.store.get(rid, 'Test', 'Unknown'))
+        for k in self.index_keys(raw_val):
+            self.lookup_map.setdefault(k, []).append(rid)
+
+            # 复合索引：同一 (机台, Test) 保留第一行
+            for comp in comps:
+                self.test_index.setdefault((k, comp), rid)
+            self.scope_map[k] = self.scope_map.get(k, frozenset()) | comps
+
+    def _unindex_row(self, raw_val, rid):
+        for k in self.index_keys(raw_val):
+            bucket = self.lookup_map.get(k)
+            if not bucket:
+                continue
+            bucket.remove(rid)
+
+            # 复合索引按剩余行重建 (单个机台行数很少)
+            for comp in self.scope_map.pop(k, ()):
+                self.test_index.pop((k, comp), None)
+            if not bucket:
+                del self.lookup_map[k]
+                continue
+            for other in bucket:
+                comps = self.split_tests(self.store.get(other, 'Test', 'Unknown'))
+                for comp in comps:
+                    self.test_index.setdefault((k, comp), other)
+                self.scope_map[k] = self.scope_map.get(k, frozenset()) | comps
+
+    def get_test_scope(self, rel_no):
+        """返回机台的全部 Test 分量 (frozenset)，加载时已预先算好"""
+        if not rel_no: return frozenset()
+        return self.scope_map.get(self._resolve_key(rel_no), frozenset())
+
+    def row_view(self, rid):
+        return RowView(self.store, rid)
 
     def get_unit_info(self, rel_no, target_test=None):
         """
-        返回 Unit 信息列表。
+        返回 Unit 信息列表 (RowView，用法同 dict 的 .get())。
+        指定 target_test 时，优先通过复合索引返回该 Test 对应的那一行。
         """
         if not rel_no: return None
 
-        rel_no = str(rel_no).strip()
-        candidates = []
-
-        # 1. 直接查找
-        if rel_no in self.lookup_map:
-            candidates = self.lookup_map[rel_no]
+        # 规范化后查找 (文件名 65 / 0065 / 00065 都落到同一个数字 Key)
+        key = self._resolve_key(rel_no)
+        if target_test:
+            rid = self.test_index.get((key, str(target_test).strip()))
+            if rid is not None:
+                return [RowView(self.store, rid)]
 
-        # 2. 尝试补零查找 (兼容文件名 65 -> CSV 0065)
-        elif rel_no.isdigit():
-            padded = rel_no.zfill(4)
-            if padded in self.lookup_map:
-                candidates = self.lookup_map[padded]
+        candidates = self.lookup_map.get(key)
 
-        return candidates if candidates else None
\ No newline at end of file
+        return [RowView(self.store, rid) for rid in candidates] if candidates else None
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from loguru import logger
+from src.utils.file_cache import FileCache
+
+# 模板里可用的 EXIF 变量
+EXIF_KEYS = ('ExifDate', 'ExifTime', 'ExifCamera', 'ExifWidth', 'ExifHeight')
+
+# 读不到时模板里填的值 (与 UnknownCP 一致)
+EXIF_UNKNOWN = "Unknown"
+
+TAG_MODEL = 0x0110
+TAG_DATETIME = 0x0132
+TAG_ORIENTATION = 0x0112
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+
+
+def read_exif(path):
+    """
+    只解析文件头和 EXIF 段 (Image.open 是惰性的，不解码像素)，返回 {EXIF_KEYS: str 或 None}。
+    宽高按 EXIF 方向换算成显示方向 (竖拍的照片 宽 < 高)。
+    """
+    from PIL import Image
+    with Image.open(path) as im:
+        width, height = im.size
+        exif = im.getexif()
+
+    shot = exif.get_ifd(TAG_EXIF_IFD).get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME)
+    date = time = None
+    if isinstance(shot, str) and len(shot) >= 19:
+        # "2024:03:15 14:30:12"
+        date = shot[0:4] + shot[5:7] + shot[8:10]
+        time = shot[11:13] + shot[14:16] + shot[17:19]
+        if not (date.isdigit() and time.isdigit()):
+            date = time = None
+
+    if exif.get(TAG_ORIENTATION) in (5, 6, 7, 8):
+        width, height = height, width
+
+    model = exif.get(TAG_MODEL)
+    model = model.strip('\x00 ') if isinstance(model, str) else None
+    return {
+        'ExifDate': date,
+        'ExifTime': time,
+        'ExifCamera': model or None,
+        'ExifWidth': str(width),
+        'ExifHeight': str(height),
+    }
+
+
+class ExifReader:
+    """
+    按需读取 EXIF：只有模板用到 EXIF 变量时才会调用，结果按 (路径, 大小, 修改时间) 持久化缓存。
+    批量读取在线程池中进行 (主要耗时是读卡/NAS 的 I/O)。
+    """
+
+    def __init__(self, workers=8, cache=None):
+        self.workers = max(1, int(workers))
+        self._cache = cache
+
+    @property
+    def cache(self):
+        # 延迟创建：模板不用 EXIF 时连缓存文件都不打开
+        if self._cache is None:
+            self._cache = FileCache('exif')
+        return self._cache
+
+    def read(self, path):
+        """读取单个文件 (优先用缓存)，读取失败时各字段为 None；新读到的结果立即写回缓存文件"""
+        info, fresh = self._read(path)
+        if fresh:
+            self.cache.save()
+        return info
+
+    def _read(self, path):
+        """返回 (info, 是否新读取)，只更新内存中的缓存，由调用方负责 save"""
+        key = FileCache.key_for(path)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, False
+        try:
+            info = read_exif(path)
+        except Exception as e:
+            logger.warning(f"无法读取 EXIF {path}: {e}")
+            info = {k: None for k in EXIF_KEYS}
+        self.cache.set(key, info)
+        return info, True
+
+    def read_many(self, paths, on_progress=None):
+        """
+        Args:
+            on_progress: on_progress(done, total)，在调用线程中触发 (GUI 可以在回调里刷新界面)
+        Returns: {path: info}
+        """
+        if not paths:
+            return {}
+        result = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # 线程里只更新内存缓存，全部读完后统一保存一次
+            futures = {pool.submit(self._read, path): path for path in paths}
+            for done, fut in enumerate(as_completed(futures), 1):
+                result[futures[fut]] = fut.result()[0]
+                if on_progress:
+                    on_progress(done, len(paths))
+        self.cache.save()
+        logger.info(f"📷 读取 EXIF: {len(paths)} 张")
+        return result
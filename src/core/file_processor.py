@@ -1,11 +1,35 @@
 import os
+import re
 import shutil
 from src.utils.constants import COLOR_RED
+from src.core.exif_reader import ExifReader, EXIF_KEYS, EXIF_UNKNOWN
 
 
 class FileProcessor:
+    # 模板占位符 {Key}
+    PLACEHOLDER_RE = re.compile(r'\{([^{}]+)\}')
+
     def __init__(self, settings):
         self.settings = settings
+        self.exif_reader = ExifReader()
+
+    @property
+    def settings(self):
+        return self._settings
+
+    @settings.setter
+    def settings(self, value):
+        # 设置变更 -> 丢弃已编译的模板和清洗表
+        self._settings = value
+        self._compiled = {}
+        illegal_chars = value.get('illegal_chars', []) if value else []
+        # 数据值：所有非法字符都替换为 "-"
+        self._value_table = str.maketrans({c: "-" for c in illegal_chars if len(c) == 1})
+        # 文件夹模板字面量：保留路径分隔符 / 和 \
+        self._folder_table = str.maketrans({c: "-" for c in illegal_chars
+                                            if len(c) == 1 and c not in ('/', '\\')})
+        # 多字符的"非法字符"无法放进 translate 表，保留逐个替换
+        self._multi_chars = [c for c in illegal_chars if len(c) > 1]
 
     def generate_target_path(self, parse_result, output_dir_override=None):
         if not parse_result['rel_no'] or not parse_result['unit_data']:
@@ -14,8 +38,6 @@ class FileProcessor:
         is_issue = (parse_result['type'] == 'Issue')
         config_key = 'issue_photo' if is_issue else 'regular_photo'
 
-        template_name = self.settings[config_key]['template_name']
-        template_folder = self.settings[config_key]['template_folder']
         parsed_map = self.settings[config_key]['parsed_data_map']
 
         base_out = output_dir_override
@@ -25,28 +47,40 @@ class FileProcessor:
         if not base_out:
             return None, "No Output Dir"
 
-        # 准备数据
-        data = parse_result['unit_data'].copy()
+        # 准备数据：解析出的变量叠加在机台行数据之上，不复制整行
+        parsed = {}
 
         cp_key = parsed_map.get('CP', 'CP')
         std_cp = parse_result['std_cp']
         if not std_cp or std_cp == "[Unknown CP]":
             std_cp = "UnknownCP"
-        data[cp_key] = std_cp
+        parsed[cp_key] = std_cp
 
         if is_issue:
             issue_key = parsed_map.get('Issue', 'Issue')
-            data[issue_key] = parse_result['detail']
+            parsed[issue_key] = parse_result['detail']
         else:
             orient_key = parsed_map.get('O', 'Orient')
-            data[orient_key] = parse_result['detail']
+            parsed[orient_key] = parse_result['detail']
+
+        # EXIF 变量：只有模板用到时才读取 (通常已由 prefetch_exif 批量读好)
+        if self.uses_exif(config_key):
+            exif = parse_result.get('exif')
+            if exif is None:
+                exif = parse_result['exif'] = self.exif_reader.read(parse_result['original'])
+            for key in EXIF_KEYS:
+                parsed[key] = exif.get(key) or EXIF_UNKNOWN
+
+        unit_data = parse_result['unit_data']
 
         # 1. 生成文件名 (is_folder=False, 所有非法字符都替换)
-        filename = self._fill_template(template_name, data, is_folder=False)
+        name_segments = self._get_compiled(config_key, 'template_name', is_folder=False)
+        filename = self._render(name_segments, parsed, unit_data)
         filename += parse_result['ext']
 
         # 2. 生成文件夹路径 (is_folder=True, 保留 / 和 \)
-        folder_relative = self._fill_template(template_folder, data, is_folder=True)
+        folder_segments = self._get_compiled(config_key, 'template_folder', is_folder=True)
+        folder_relative = self._render(folder_segments, parsed, unit_data)
 
         # 标准化路径
         folder_relative = os.path.normpath(folder_relative)
@@ -55,36 +89,90 @@ class FileProcessor:
 
         return full_path, filename
 
+    def uses_exif(self, config_key):
+        """该类照片的文件名/文件夹模板是否用到了 EXIF 变量"""
+        for template_key, is_folder in (('template_name', False), ('template_folder', True)):
+            for is_literal, text in self._get_compiled(config_key, template_key, is_folder):
+                if not is_literal and text in EXIF_KEYS:
+                    return True
+        return False
+
+    def prefetch_exif(self, parse_results, on_progress=None):
+        """
+        生成目标路径前批量 (并行) 读取模板需要的 EXIF，结果写入 parse_result['exif']
+        on_progress(done, total) 在调用线程中触发，见 ExifReader.read_many
+        """
+        todo = [res for res in parse_results
+                if res.get('exif') is None and res.get('rel_no') and res.get('unit_data')
+                and self.uses_exif('issue_photo' if res['type'] == 'Issue' else 'regular_photo')]
+        if not todo:
+            return
+        infos = self.exif_reader.read_many([res['original'] for res in todo], on_progress=on_progress)
+        for res in todo:
+            res['exif'] = infos[res['original']]
+
+    def _get_compiled(self, config_key, template_key, is_folder):
+        cache_key = (config_key, template_key)
+        segments = self._compiled.get(cache_key)
+        if segments is None:
+            template = self.settings[config_key][template_key]
+            segments = self._compile_template(template, is_folder)
+            self._compiled[cache_key] = segments
+        return segments
+
+    def _compile_template(self, template, is_folder=False):
+        """
+        把模板编译为片段列表：(True, 字面量) / (False, 占位符 Key)
+        字面量在编译时就清理掉非法字符，渲染时只需处理模板用到的变量。
+        """
+        table = self._folder_table if is_folder else self._value_table
+        segments = []
+        pos = 0
+        for m in self.PLACEHOLDER_RE.finditer(template):
+            if m.start() > pos:
+                segments.append((True, self._clean_literal(template[pos:m.start()], table)))
+            segments.append((False, m.group(1)))
+            pos = m.end()
+        if pos < len(template):
+            segments.append((True, self._clean_literal(template[pos:], table)))
+        return segments
+
+    def _clean_literal(self, text, table):
+        text = text.translate(table)
+        for char in self._multi_chars:
+            text = text.replace(char, "-")
+        return text
+
+    def _sanitize_value(self, val):
+        # 无论如何，数据值里不能有非法字符 (比如机台号里不能有 /)
+        val_str = str(val).strip().translate(self._value_table)
+        for char in self._multi_chars:
+            val_str = val_str.replace(char, "-")
+        return val_str
+
+    def _render(self, segments, parsed, unit_data):
+        parts = []
+        for is_literal, text in segments:
+            if is_literal:
+                parts.append(text)
+                continue
+            if text in parsed:
+                val = parsed[text]
+            else:
+                val = unit_data.get(text)
+            if val is None:
+                # 未知变量原样保留 (与旧版行为一致)
+                parts.append(self._clean_literal(f"{{{text}}}", self._value_table))
+            else:
+                parts.append(self._sanitize_value(val))
+        return "".join(parts)
+
     def _fill_template(self, template, data, is_folder=False):
-        result = template
-        illegal_chars = self.settings.get('illegal_chars', [])
-
-        # 1. 先处理数据值中的非法字符
-        safe_data = {}
-        for key, val in data.items():
-            val_str = str(val).strip()
-            # 无论如何，数据值里不能有非法字符 (比如机台号里不能有 /)
-            for char in illegal_chars:
-                val_str = val_str.replace(char, "-")
-            safe_data[key] = val_str
-
-        # 2. 替换变量
-        for key, val in safe_data.items():
-            result = result.replace(f"{{{key}}}", val)
-
-        # 3. 最后清理模板本身可能残留的非法字符
-        # 如果是文件夹模式，保留路径分隔符 / 和 \
-        chars_to_strip = list(illegal_chars)
-        if is_folder:
-            if '/' in chars_to_strip: chars_to_strip.remove('/')
-            if '\\' in chars_to_strip: chars_to_strip.remove('\\')
-
-        for char in chars_to_strip:
-            result = result.replace(char, "-")
-
-        return result
+        """按普通 dict 渲染任意模板 (设置页预览等非热路径使用)"""
+        segments = self._compile_template(template, is_folder)
+        return self._render(segments, data, {})
 
     def check_duplicate(self, target_path):
         if os.path.exists(target_path):
             return True
-        return False
\ No newline at end of file
+        return False
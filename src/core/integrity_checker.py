@@ -0,0 +1,143 @@
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
+from src.utils.file_cache import FileCache
+
+INTEGRITY_MODES = ('off', 'quick', 'full')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+# 相机/手机常在 EOI 之后追加数据 (如 Samsung 尾部信息)，在文件尾这么大的范围内找 EOI
+JPEG_TAIL_BYTES = 64 * 1024
+
+
+def _check_jpeg(f, size):
+    """逐段走 JPEG 头部标记直到 SOS，再确认文件尾有 EOI (FFD9)。返回错误信息或 None"""
+    if f.read(2) != b'\xff\xd8':
+        return "缺少 JPEG 文件头 (SOI)"
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2:
+            return "文件头被截断"
+        if marker[0] != 0xFF:
+            return f"无效的段标记 {marker.hex()} (位置 {f.tell() - 2})"
+        code = marker[1]
+        if code == 0xFF:
+            # 填充字节
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code == 0xDA:
+            break
+        if 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue
+        raw = f.read(2)
+        if len(raw) < 2:
+            return "文件头被截断"
+        length = struct.unpack('>H', raw)[0]
+        if length < 2 or f.tell() + length - 2 > size:
+            return f"段长度越界 (标记 FF{code:02X})"
+        f.seek(length - 2, os.SEEK_CUR)
+
+    # 尾部：去掉补零后应以 EOI 结尾；否则在尾部范围内找 EOI (EOI 之后追加了数据)
+    tail_len = min(size, JPEG_TAIL_BYTES)
+    f.seek(size - tail_len)
+    tail = f.read(tail_len).rstrip(b'\x00')
+    if tail.endswith(b'\xff\xd9'):
+        return None
+    if size > 2 * JPEG_TAIL_BYTES and b'\xff\xd9' in tail:
+        return None
+    return "缺少 JPEG 结束标记 (EOI)，文件可能被截断"
+
+
+def _check_png(f, size):
+    if f.read(8) != PNG_SIGNATURE:
+        return "缺少 PNG 文件头"
+    f.seek(max(0, size - len(PNG_IEND)))
+    if f.read() != PNG_IEND:
+        return "缺少 PNG 结束块 (IEND)，文件可能被截断"
+    return None
+
+
+def check_image(path, full=False):
+    """
+    在子进程中运行，返回 (path, 错误信息 或 None)。
+    quick: 只读文件头和文件尾检查 JPEG/PNG 结构标记，其他格式不检查；
+    full : 额外用 Pillow 的 verify() 并按缩小比例 (draft) 完整解码一遍，截断的数据会在解码时报错。
+    """
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            return path, "空文件"
+        ext = os.path.splitext(path)[1].lower()
+        with open(path, 'rb') as f:
+            if ext in ('.jpg', '.jpeg'):
+                error = _check_jpeg(f, size)
+            elif ext == '.png':
+                error = _check_png(f, size)
+            else:
+                error = None
+        if error or not full:
+            return path, error
+
+        from PIL import Image
+        with Image.open(path) as im:
+            im.verify()
+        with Image.open(path) as im:
+            im.draft('RGB', (im.width // 8 or 1, im.height // 8 or 1))
+            im.load()
+        return path, None
+    except Exception as e:
+        return path, str(e) or type(e).__name__
+
+
+class IntegrityChecker:
+    """
+    执行前的图片完整性检查 (读卡失败导致的截断 JPEG 等)：
+    在进程池中并行检查，结果按 (路径, 大小, 修改时间) 持久化缓存，同一批照片再次执行时不再读盘。
+    """
+
+    def __init__(self, workers=None, cache=None):
+        self.workers = workers or os.cpu_count() or 2
+        self.cache = cache or FileCache('integrity')
+
+    def check(self, paths, full=False, on_progress=None, is_cancelled=None):
+        """
+        Returns:
+            {path: 错误信息}，只包含损坏的文件
+        """
+        corrupt = {}
+        todo = []
+        for p in paths:
+            cached = self.cache.get(FileCache.key_for(p))
+            # quick 的结果不能代替 full：要求 full 检查时只认 full 的缓存
+            if cached is not None and (cached['full'] or not full):
+                if cached['error']:
+                    corrupt[p] = cached['error']
+            else:
+                todo.append(p)
+
+        done = len(paths) - len(todo)
+        if on_progress:
+            on_progress(done, len(paths))
+        if todo:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(check_image, p, full) for p in todo]
+                for fut in as_completed(futures):
+                    path, error = fut.result()
+                    if error:
+                        corrupt[path] = error
+                        logger.warning(f"⚠️ 图片损坏 {path}: {error}")
+                    self.cache.set(FileCache.key_for(path), {'error': error, 'full': full})
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(paths))
+                    if is_cancelled and is_cancelled():
+                        for f in futures:
+                            f.cancel()
+                        break
+            self.cache.save()
+        logger.info(f"🩺 完整性检查 ({'full' if full else 'quick'}): {len(paths)} 张，"
+                    f"缓存命中 {len(paths) - len(todo)} 张，损坏 {len(corrupt)} 张")
+        return corrupt
@@ -0,0 +1,142 @@
+import time
+import threading
+from loguru import logger
+
+
+class TokenBucket:
+    """
+    令牌桶限速：rate 为每秒补充的令牌数，burst 为桶容量 (允许的瞬时突发)。
+    单次请求超过桶容量时 (比如一个大文件) 允许透支，之后的请求等待补回，
+    长期平均速率仍然不超过 rate。rate <= 0 表示不限速。
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate or 0)
+        self.capacity = float(burst if burst is not None else self.rate)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        if self.rate <= 0 or amount <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            # 先扣除 (可能扣成负数)，再按欠额计算需要等待的时间
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class IoThrottle:
+    """
+    执行阶段的 I/O 节流 (多个设备组的线程池共用一个实例)：
+      - 字节/秒、文件/秒 两个令牌桶
+      - 同时进行的操作数上限 (背压：超过上限的线程在 acquire 处等待)
+      - adaptive=True 时按观测到的延迟做 AIMD 调整：延迟明显变长 (共享存储拥塞)
+        就把并发上限减半，恢复正常后每完成一轮加 1，最多回到 max_in_flight
+    """
+
+    # 每字节延迟的 EWMA 超过历史最好水平的多少倍视为拥塞
+    CONGESTION_FACTOR = 2.0
+    EWMA_ALPHA = 0.2
+    # 统计延迟时把小文件按至少 64KB 计，避免元数据操作把"每字节延迟"放大
+    MIN_COST_BYTES = 64 * 1024
+
+    def __init__(self, bytes_per_sec=0, files_per_sec=0, max_in_flight=0, adaptive=False):
+        # 突发量取 1/4 秒的额度，避免批次开头一下子冲满共享存储
+        self.bytes_bucket = TokenBucket(bytes_per_sec, burst=max((bytes_per_sec or 0) / 4, 1 << 20))
+        self.files_bucket = TokenBucket(files_per_sec, burst=max((files_per_sec or 0) / 4, 1))
+        self.max_in_flight = int(max_in_flight or 0)
+        self.adaptive = adaptive
+        # 0 = 不限并发 (由各线程池大小决定)
+        self.limit = self.max_in_flight
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._ewma = None
+        self._best = None
+        self._since_change = 0
+
+        self.start_time = None
+        self.bytes_done = 0
+        self.files_done = 0
+        self.throttled_seconds = 0.0
+
+    @classmethod
+    def from_settings(cls, exec_cfg):
+        """按 settings['execution'] 构建；没有任何限制时返回 None (执行器不做节流)"""
+        mb_per_sec = float(exec_cfg.get('max_mb_per_sec', 0) or 0)
+        files_per_sec = float(exec_cfg.get('max_files_per_sec', 0) or 0)
+        max_in_flight = int(exec_cfg.get('max_in_flight', 0) or 0)
+        adaptive = bool(exec_cfg.get('adaptive_throttle', False))
+        if not (mb_per_sec or files_per_sec or max_in_flight or adaptive):
+            return None
+        if adaptive and not max_in_flight:
+            # 自适应需要一个上限作为起点
+            max_in_flight = int(exec_cfg.get('workers_per_device', 4)) * 2
+        return cls(bytes_per_sec=mb_per_sec * 1024 * 1024, files_per_sec=files_per_sec,
+                   max_in_flight=max_in_flight, adaptive=adaptive)
+
+    def acquire(self, nbytes):
+        """开始一项操作前调用 (工作线程中，可能阻塞)"""
+        with self._cond:
+            if self.start_time is None:
+                self.start_time = time.monotonic()
+            while self.limit and self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        waited = self.files_bucket.acquire(1) + self.bytes_bucket.acquire(nbytes)
+        with self._cond:
+            self.throttled_seconds += waited
+
+    def release(self, nbytes, elapsed, ok=True):
+        """一项操作结束后调用，elapsed 为实际 I/O 耗时 (不含限速等待)"""
+        with self._cond:
+            self.in_flight -= 1
+            if ok:
+                self.bytes_done += nbytes
+                self.files_done += 1
+                if self.adaptive:
+                    self._adapt(elapsed / max(nbytes, self.MIN_COST_BYTES))
+            self._cond.notify_all()
+
+    def _adapt(self, latency):
+        """AIMD：拥塞时并发减半，否则每完成 limit 项加 1 (调用方持有锁)"""
+        self._ewma = latency if self._ewma is None else (
+            self.EWMA_ALPHA * latency + (1 - self.EWMA_ALPHA) * self._ewma)
+        if self._best is None or self._ewma < self._best:
+            self._best = self._ewma
+        self._since_change += 1
+
+        if self._ewma > self._best * self.CONGESTION_FACTOR:
+            if self.limit > 1 and self._since_change >= self.limit:
+                self.limit = max(1, self.limit // 2)
+                self._since_change = 0
+                logger.info(f"🐢 延迟升高，并发上限降为 {self.limit}")
+        elif self.limit < self.max_in_flight and self._since_change >= self.limit:
+            self.limit += 1
+            self._since_change = 0
+
+    def stats(self):
+        """实际生效的速率"""
+        elapsed = time.monotonic() - self.start_time if self.start_time else 0.0
+        return {
+            'elapsed': elapsed,
+            'files': self.files_done,
+            'bytes': self.bytes_done,
+            'mb_per_sec': self.bytes_done / elapsed / (1024 * 1024) if elapsed > 0 else 0.0,
+            'files_per_sec': self.files_done / elapsed if elapsed > 0 else 0.0,
+            'in_flight_limit': self.limit,
+            'throttled_seconds': self.throttled_seconds,
+        }
+
+    def describe(self):
+        s = self.stats()
+        text = f"{s['mb_per_sec']:.1f} MB/s，{s['files_per_sec']:.1f} 文件/s"
+        if self.limit:
+            text += f"，并发 {self.limit}"
+        return text
@@ -0,0 +1,416 @@
+import os
+import sys
+import shutil
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from loguru import logger
+
+# linux/fs.h: #define FICLONE _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# 校验复制每块大小
+COPY_CHUNK = 8 << 20
+
+# 支持的输出模式 (transcode 由 Transcoder 执行，archive 由 ArchiveExporter 执行)
+OUTPUT_MODES = ('move', 'copy', 'hardlink', 'reflink', 'transcode', 'archive')
+
+# 落盘策略
+#   none       - 不调用 fsync，交给操作系统 (最快)
+#   files      - 全部完成后并行 fsync 目标文件
+#   files_dirs - 全部完成后并行 fsync 目标文件和涉及的目录 (重命名本身也落盘)
+#   per_file   - 每个文件完成后立即 fsync 文件和目录 (最慢，最安全)
+DURABILITY_MODES = ('none', 'files', 'files_dirs', 'per_file')
+
+
+def fsync_path(path):
+    """把文件数据刷到磁盘 (Windows 的 FlushFileBuffers 需要写权限)"""
+    try:
+        fd = os.open(path, os.O_RDWR if os.name == 'nt' else os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return True
+    except OSError as e:
+        logger.warning(f"fsync 失败 {path}: {e}")
+        return False
+
+
+def fsync_dir(path):
+    """把目录项 (新建/重命名/删除) 刷到磁盘；Windows 不能打开目录，直接跳过"""
+    if os.name == 'nt':
+        return True
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return True
+    except OSError as e:
+        logger.warning(f"目录 fsync 失败 {path}: {e}")
+        return False
+
+
+class MoveExecutor:
+    """
+    并行移动执行器：按 (源设备, 目标设备) 分组，每组一个有界线程池。
+    同一文件系统内用 os.replace (仅改元数据)，跨设备用 校验复制 + 删除源文件。
+    不同磁盘/读卡器之间互不等待，吞吐随独立设备数增长。
+
+    输出模式 (mode，也可以按 op['action'] 单独指定)：
+      move     - 移动 (默认)
+      copy     - 复制，保留原文件
+      hardlink - 同一文件系统内建硬链接，跨设备退化为复制
+      reflink  - 写时复制克隆 (FICLONE)，不支持时退化为复制
+      remove   - 删除 op['src'] (撤销复制类操作时使用)
+
+    进度回调在调用 run() 的线程里触发 (GUI 线程可以直接刷新界面)。
+    落盘策略 (durability) 见 DURABILITY_MODES：批量模式在全部操作结束后统一并行 fsync 一轮。
+    传入 throttle (IoThrottle) 时，每项操作开始前按字节数/文件数取令牌并占用一个并发名额。
+    """
+
+    def __init__(self, workers_per_group=4, mode='move', durability='none', throttle=None):
+        self.workers_per_group = max(1, int(workers_per_group))
+        self.mode = mode if mode in OUTPUT_MODES else 'move'
+        self.durability = durability if durability in DURABILITY_MODES else 'none'
+        # IoThrottle (可选)：所有设备组共用的限速/背压
+        self.throttle = throttle
+        self._dev_cache = {}
+        # 最近一次 run() 的吞吐 {'files', 'bytes', 'seconds'}，供耗时估算使用
+        self.last_run = None
+
+    def _device_of(self, path):
+        """目录所在设备号，按目录缓存 (目录不存在时向上找到已存在的父目录)"""
+        probe = path
+        while probe and probe not in self._dev_cache:
+            try:
+                self._dev_cache[probe] = os.stat(probe).st_dev
+                break
+            except OSError:
+                parent = os.path.dirname(probe)
+                if parent == probe:
+                    return None
+                probe = parent
+        return self._dev_cache.get(probe)
+
+    def run(self, ops, on_result=None, is_cancelled=None):
+        """
+        Args:
+            ops: [{'src', 'dst', 'action'(可选), ...}, ...]，dst 必须是最终路径 (冲突已在计划阶段解决)，
+                 目标目录需已创建
+            on_result: 每完成一项回调 on_result(op, done_count, total)
+            is_cancelled: 返回 True 时取消尚未开始的操作
+        Returns:
+            ops 本身，每项补充 'status' ('ok' / 'error' / 'cancelled')、'error'、'elapsed'，
+            以及实际执行的 'action' (硬链接/克隆不可用时会退化为 copy)，
+            发生数据复制时还有 'digest' (blake2b)
+        """
+        if not ops:
+            return ops
+
+        # 1. 按 (源设备, 目标设备) 分组
+        groups = {}
+        for op in ops:
+            src_dev = self._device_of(os.path.dirname(op['src']))
+            dst_dev = self._device_of(os.path.dirname(op.get('dst') or op['src']))
+            op['same_device'] = src_dev is not None and src_dev == dst_dev
+            groups.setdefault((src_dev, dst_dev), []).append(op)
+
+        logger.info(f"🚚 并行执行 {len(ops)} 项，共 {len(groups)} 个设备组，每组 {self.workers_per_group} 线程")
+
+        run_start = time.perf_counter()
+        pools = []
+        futures = {}
+        try:
+            # 2. 每组一个线程池，全部同时开工
+            for group_ops in groups.values():
+                pool = ThreadPoolExecutor(max_workers=self.workers_per_group)
+                pools.append(pool)
+                for op in group_ops:
+                    futures[pool.submit(self._execute_one, op)] = op
+
+            # 3. 在调用线程汇总结果并回调
+            done = 0
+            cancelled = False
+            for fut in as_completed(futures):
+                op = futures[fut]
+                if fut.cancelled():
+                    op['status'] = 'cancelled'
+                    op['error'] = "用户取消"
+                done += 1
+                if on_result:
+                    on_result(op, done, len(ops))
+                if not cancelled and is_cancelled and is_cancelled():
+                    cancelled = True
+                    for f in futures:
+                        f.cancel()
+        finally:
+            for pool in pools:
+                pool.shutdown(wait=True)
+
+        # 4. 批量落盘：所有移动结束后并行 fsync 一轮，而不是每个文件串行等待
+        if self.durability in ('files', 'files_dirs'):
+            self._sync_batch([op for op in ops if op.get('status') == 'ok'], len(groups))
+
+        ok_ops = [op for op in ops if op.get('status') == 'ok']
+        self.last_run = {'files': len(ok_ops), 'bytes': sum(self._data_bytes(op) for op in ok_ops),
+                         'seconds': time.perf_counter() - run_start}
+        if self.throttle:
+            logger.info(f"📶 实际速率: {self.throttle.describe()}，"
+                        f"限速等待共 {self.throttle.stats()['throttled_seconds']:.1f}s")
+        return ops
+
+    def _data_bytes(self, op):
+        """一项操作实际要搬运的字节数 (只改目录项的操作为 0)"""
+        action = op.get('action') or self.mode
+        if action == 'remove':
+            return 0
+        if op.get('same_device') and action in ('move', 'hardlink', 'reflink'):
+            return 0
+        return op.get('size') or 0
+
+    def _sync_targets(self, op):
+        """一项操作需要落盘的 (文件, 目录)"""
+        files, dirs = [], []
+        action = op.get('action') or self.mode
+        if action == 'remove':
+            dirs.append(os.path.dirname(op['src']))
+            return files, dirs
+        files.append(op['dst'])
+        dirs.append(os.path.dirname(op['dst']))
+        if action == 'move':
+            # 源目录少了一个目录项，也要落盘
+            dirs.append(os.path.dirname(op['src']))
+        return files, dirs
+
+    def _sync_batch(self, ok_ops, group_count):
+        start = time.perf_counter()
+        files, dirs = set(), set()
+        for op in ok_ops:
+            f, d = self._sync_targets(op)
+            files.update(f)
+            dirs.update(d)
+        if self.durability != 'files_dirs':
+            dirs = set()
+
+        workers = self.workers_per_group * max(1, group_count)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # 先文件后目录：目录项指向的数据必须先落盘
+            failed = sum(1 for ok in pool.map(fsync_path, files) if not ok)
+            failed += sum(1 for ok in pool.map(fsync_dir, dirs) if not ok)
+
+        logger.info(f"💾 落盘完成: {len(files)} 个文件，{len(dirs)} 个目录，"
+                    f"耗时 {time.perf_counter() - start:.2f}s" + (f"，{failed} 项失败" if failed else ""))
+
+    def _execute_one(self, op):
+        start = time.perf_counter()
+        try:
+            # 记录源文件大小/修改时间，供日志与撤销校验
+            st = os.stat(op['src'])
+            op['size'] = st.st_size
+            op['mtime'] = st.st_mtime
+            op.setdefault('action', self.mode)
+        except Exception as e:
+            op['status'] = 'error'
+            op['error'] = str(e)
+            op['elapsed'] = time.perf_counter() - start
+            return op
+
+        nbytes = self._data_bytes(op)
+        if self.throttle:
+            self.throttle.acquire(nbytes)
+        io_start = time.perf_counter()
+        try:
+            self._transfer(op)
+            if self.durability == 'per_file':
+                files, dirs = self._sync_targets(op)
+                for path in files:
+                    fsync_path(path)
+                for path in dirs:
+                    fsync_dir(path)
+            op['status'] = 'ok'
+            op['error'] = None
+        except Exception as e:
+            op['status'] = 'error'
+            op['error'] = str(e)
+        finally:
+            if self.throttle:
+                self.throttle.release(nbytes, time.perf_counter() - io_start, ok=op.get('status') == 'ok')
+        op['elapsed'] = time.perf_counter() - start
+        return op
+
+    def _transfer(self, op):
+        """按操作类型分派：move / copy / hardlink / reflink / remove"""
+        action = op.get('action') or self.mode
+        src, dst = op['src'], op.get('dst')
+
+        if action == 'remove':
+            os.remove(src)
+            return
+
+        if action == 'move':
+            if op.get('same_device'):
+                # 同一文件系统：只改目录项
+                os.replace(src, dst)
+                return
+            # 跨设备：删除源文件前目标必须已经落盘 (不能等到批末) 并重读核对，与落盘策略无关
+            op['digest'] = self._copy_via_tmp(src, dst, lambda s, d: self._verified_copy(s, d, read_back=True))
+            os.remove(src)
+            return
+
+        if action == 'hardlink':
+            if op.get('same_device'):
+                # 同一文件系统：只增加一个目录项，零数据 I/O
+                self._copy_via_tmp(src, dst, os.link)
+                return
+            # 硬链接不能跨设备，退化为复制
+            op['action'] = 'copy'
+            op['digest'] = self._copy_via_tmp(src, dst, self._verified_copy)
+            return
+
+        if action == 'reflink':
+            if op.get('same_device') and self._copy_via_tmp(src, dst, self._reflink_copy, allow_fail=True):
+                return
+            # 文件系统不支持 (ext4/NTFS/跨设备)，退化为内核态复制
+            # (copy_file_range 在 NFS 4.2 / SMB 上还可能走服务端复制)
+            op['action'] = 'copy'
+            op['digest'] = self._copy_via_tmp(src, dst, self._verified_copy)
+            return
+
+        if action == 'copy':
+            op['digest'] = self._copy_via_tmp(src, dst, self._verified_copy)
+            return
+
+        raise ValueError(f"未知的输出模式: {action}")
+
+    @staticmethod
+    def _copy_via_tmp(src, dst, copy_func, allow_fail=False):
+        """
+        先写到临时文件，完整后再原子替换为目标；失败时清理半截文件
+        Returns: copy_func 的返回值 (校验复制返回摘要)；allow_fail 且失败时返回 False
+        """
+        tmp = dst + ".part"
+        try:
+            result = copy_func(src, tmp)
+            os.replace(tmp, dst)
+            return result
+        except Exception:
+            if os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            if allow_fail:
+                return False
+            raise
+
+    @classmethod
+    def _verified_copy(cls, src, dst, read_back=False):
+        """
+        校验复制：数据优先用 copy_file_range / sendfile 在内核里搬运，
+        每搬完一块就 pread 同一段源数据 (刚被内核读过，命中页缓存) 计算 blake2b。
+        默认只核对写入字节数与目标大小 (复制类操作源文件保留，出错可以重做)，源数据只读一遍；
+        不一致时抛出 OSError，调用方不会删除源文件。
+        read_back=True 时 (跨设备移动，复制后要删除源文件) 先 fsync 目标 (拔盘等写入错误在这里暴露)，
+        再重读目标计算摘要与源摘要核对，代价是目标多读一遍；支持 posix_fadvise 的平台先把目标清出页缓存，
+        重读的是磁盘上的数据，其他平台 (Windows / macOS) 重读可能命中缓存，但仍然核对。
+        Returns: blake2b 十六进制摘要
+        """
+        src_hash = hashlib.blake2b()
+        with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+            fin, fout = fsrc.fileno(), fdst.fileno()
+            size = os.fstat(fin).st_size
+            offset = 0
+            methods = list(cls._kernel_methods())
+            while offset < size:
+                count = min(COPY_CHUNK, size - offset)
+                n = 0
+                while methods:
+                    try:
+                        n = methods[0](fin, fout, offset, count)
+                        break
+                    except OSError:
+                        # 旧内核 / 不支持的文件系统组合 (EXDEV、ENOSYS、EINVAL 等)，换下一种方式
+                        methods.pop(0)
+                if n:
+                    data = cls._read_at(fsrc, offset, n)
+                else:
+                    # 用户态复制兜底
+                    data = cls._read_at(fsrc, offset, count)
+                    if not data:
+                        break
+                    cls._write_all(fdst, data)
+                src_hash.update(data)
+                offset += len(data)
+
+            if offset != size or os.fstat(fout).st_size != size:
+                raise OSError(f"复制不完整: 期望 {size} 字节，实际写入 {os.fstat(fout).st_size} 字节")
+            if read_back:
+                os.fsync(fout)
+                if hasattr(os, 'posix_fadvise'):
+                    try:
+                        os.posix_fadvise(fout, 0, 0, os.POSIX_FADV_DONTNEED)
+                    except OSError:
+                        # 只是清缓存，不支持时照常核对
+                        pass
+
+        digest = src_hash.hexdigest()
+        if read_back and cls.file_digest(dst) != digest:
+            raise OSError("复制校验失败: 目标文件摘要与源文件不一致")
+        shutil.copystat(src, dst)
+        return digest
+
+    @staticmethod
+    def _kernel_methods():
+        """可用的内核态复制方式：fn(fin, fout, offset, count) -> 已复制字节数"""
+        if hasattr(os, 'copy_file_range'):
+            yield lambda fin, fout, offset, count: os.copy_file_range(fin, fout, count, offset)
+        if sys.platform.startswith('linux') and hasattr(os, 'sendfile'):
+            # Linux 2.6.33+ 的 sendfile 可以写普通文件
+            yield lambda fin, fout, offset, count: os.sendfile(fout, fin, offset, count)
+
+    @staticmethod
+    def _read_at(f, offset, count):
+        if hasattr(os, 'pread'):
+            return os.pread(f.fileno(), count, offset)
+        f.seek(offset)
+        return f.read(count)
+
+    @staticmethod
+    def _write_all(f, data):
+        view = memoryview(data)
+        while view:
+            written = f.write(view)
+            view = view[written:]
+
+    @staticmethod
+    def file_digest(path):
+        """整文件 blake2b 摘要"""
+        h = hashlib.blake2b()
+        with open(path, 'rb', buffering=0) as f:
+            buf = bytearray(COPY_CHUNK)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+        return h.hexdigest()
+
+    @staticmethod
+    def _reflink_copy(src, dst):
+        """
+        写时复制克隆：Linux 上用 FICLONE ioctl (btrfs / XFS / bcachefs)，
+        只复制元数据，数据块共享。其他平台或不支持时抛出 OSError。
+        """
+        try:
+            import fcntl
+        except ImportError:
+            raise OSError("当前平台不支持 reflink")
+
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return True
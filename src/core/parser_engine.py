@@ -32,6 +32,7 @@ class ParserEngine:
             "ext": ext,
             "rel_no": None,
             "unit_data": None,
+            "unit_row": None,
             "raw_cp": "",
             "std_cp": "[Unknown CP]",
             "raw_detail": "",
@@ -162,23 +163,11 @@ class ParserEngine:
         result['raw_cp'] = ' '.join(remaining_tokens)
 
         # 4. 搜寻 CP
-        excel_test_strings = set()
-        for row in candidates_rows:
-            t = str(row.get('Test', 'Unknown')).strip()
-            excel_test_strings.add(t)
-
-        best_match = {"std_cp": None, "raw_score": 0.0, "final_conf": 0.0}
+        best_match = {"std_cp": None, "raw_score": 0.0, "final_conf": 0.0, "test": None}
 
         if result['raw_cp']:
-            strict_scope = set()
-            for test_str in excel_test_strings:
-                if test_str in self.cp_map:
-                    strict_scope.add(test_str)
-                if '+' in test_str:
-                    parts = [p.strip() for p in test_str.split('+')]
-                    for p in parts:
-                        if p in self.cp_map:
-                            strict_scope.add(p)
+            # 机台的 Test 分量在加载时已预先算好，这里只需与 cp_map 求交集
+            strict_scope = self.excel.get_test_scope(found_rel_token) & self.cp_map.keys()
 
             if strict_scope:
                 best_match = self._search_best_cp(result['raw_cp'], list(strict_scope), is_context_match=True)
@@ -188,7 +177,14 @@ class ParserEngine:
                 best_match = self._search_best_cp(result['raw_cp'], all_tests, is_context_match=False)
 
         # 5. 结果结算
-        result['unit_data'] = candidates_rows[0].copy()
+        # 多 Test 机台：取与胜出 CP 所属 Test 对应的那一行
+        unit_rows = candidates_rows
+        if best_match['test']:
+            unit_rows = self.excel.get_unit_info(found_rel_token, target_test=best_match['test']) or candidates_rows
+
+        # 只保留行视图 + row id，不再复制整行 dict
+        result['unit_data'] = unit_rows[0]
+        result['unit_row'] = unit_rows[0].rid
         result['confidence'] = best_match['final_conf']
 
         if best_match['std_cp']:
@@ -230,7 +226,7 @@ class ParserEngine:
         return result
 
     def _search_best_cp(self, residual, test_scope, is_context_match):
-        best_res = {"std_cp": None, "raw_score": 0.0, "final_conf": 0.0}
+        best_res = {"std_cp": None, "raw_score": 0.0, "final_conf": 0.0, "test": None}
         resid_nums = set(re.findall(r'\d+', residual))
         resid_lower = residual.lower()
 
@@ -282,11 +278,12 @@ class ParserEngine:
                         best_res['std_cp'] = std_cp
                         best_res['raw_score'] = raw_score
                         best_res['final_conf'] = final_conf
+                        best_res['test'] = test_name
 
         # 🔥🔥🔥 修复点：垃圾分数熔断机制 🔥🔥🔥
         # 如果费半天劲算出来的最高分连 0.4 都不到，那就别瞎猜了
         if best_res['final_conf'] < 0.4:
-            return {"std_cp": None, "raw_score": 0.0, "final_conf": 0.0}
+            return {"std_cp": None, "raw_score": 0.0, "final_conf": 0.0, "test": None}
 
         return best_res
 
@@ -0,0 +1,157 @@
+import os
+import csv
+import json
+from datetime import datetime
+from loguru import logger
+from src.core.rename_planner import RenamePlanner
+from src.core.dir_cache import DirectoryCache
+from src.core.batch_manifest import BatchManifest, execute_manifest
+from src.core.transcoder import Transcoder
+from src.core.archive_exporter import ArchiveExporter
+from src.core.preflight import ThroughputHistory, preflight, format_preflight
+from src.utils.constants import COLOR_GREEN
+
+# 计划文件的列 (CSV 表头 / JSONL 字段)
+PLAN_FIELDS = ['index', 'src', 'dst', 'status', 'ready', 'confidence', 'conflict', 'conflict_with',
+               'rel_no', 'std_cp', 'detail', 'type', 'test']
+
+# 执行时遇到目标已存在的处理方式
+CONFLICT_POLICIES = ('skip', 'overwrite', 'keep-both')
+
+
+def build_plan_rows(data_list):
+    """
+    从预览表的数据构建完整的重命名计划 (不动任何文件)
+    Args:
+        data_list: PhotoTableModel.data_list
+    Returns:
+        [{PLAN_FIELDS...}, ...]
+    """
+    tasks = [(i, item['original_path'], item.get('target_full_path')) for i, item in enumerate(data_list)]
+    entries, _ = RenamePlanner.build_plan(tasks)
+
+    rows = []
+    for entry in entries:
+        pr = data_list[entry['index']]['parse_result']
+        rows.append({
+            'index': entry['index'],
+            'src': entry['src'],
+            'dst': entry['dst'] or "",
+            'status': pr.get('status_msg', ''),
+            'ready': pr.get('status_color') == COLOR_GREEN and bool(entry['dst']),
+            'confidence': round(float(pr.get('confidence') or 0), 2),
+            'conflict': entry['conflict'] or "",
+            'conflict_with': entry['conflict_with'] or "",
+            'rel_no': pr.get('rel_no') or "",
+            'std_cp': pr.get('std_cp') or "",
+            'detail': pr.get('detail') or "",
+            'type': pr.get('type') or "",
+            'test': (pr.get('unit_data') or {}).get('Test', ""),
+        })
+    return rows
+
+
+def write_plan(rows, path):
+    """按扩展名写出 .csv 或 .jsonl"""
+    if path.lower().endswith('.csv'):
+        # utf-8-sig：Excel 直接打开不会乱码
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=PLAN_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    logger.info(f"📤 重命名计划已导出: {path} ({len(rows)} 项)")
+    return path
+
+
+def read_plan(path):
+    rows = []
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                row['ready'] = str(row.get('ready', '')).strip().lower() in ('true', '1', 'yes')
+                rows.append(row)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+    return rows
+
+
+def run_plan(path, mode='move', workers_per_group=4, on_conflict='skip', journal_dir=None,
+             on_result=None, is_cancelled=None, durability='none', throttle=None, force=False, transcoder=None,
+             archiver=None):
+    """
+    无界面执行导出的计划：只处理 ready 的行；冲突按执行时的磁盘状态重新检查
+    (导出之后目录可能已经变了)。批内重复目标一律跳过，磁盘上已存在按 on_conflict 处理。
+    执行前同样落盘批次清单，中途中断后可在界面启动时继续或回滚。
+    目标盘空间不足时不执行 (force=True 时仍然执行)。
+    mode 为 transcode 时按 transcoder (Transcoder，缺省用默认参数) 的参数转码；
+    mode 为 archive 时按 archiver (ArchiveExporter) 打包，目标文件夹不会真正创建。
+
+    Returns:
+        execute_manifest 的结果，另加 'planned' (计划总行数)、'not_ready' / 'conflicts' 跳过数
+        与 'preflight' (预检摘要文本)；因空间不足放弃时只有 'aborted' 与 'preflight'
+    """
+    rows = read_plan(path)
+    ready = [r for r in rows if r.get('ready') and r.get('dst')]
+
+    dir_cache = DirectoryCache()
+    entries, _ = RenamePlanner.build_plan([(i, r['src'], r['dst']) for i, r in enumerate(ready)],
+                                          dir_cache=dir_cache)
+    ops = []
+    conflicts = 0
+    for entry in entries:
+        row = ready[entry['index']]
+        dst = entry['dst']
+        if entry['conflict'] == RenamePlanner.CONFLICT_BATCH:
+            conflicts += 1
+            continue
+        # 打包导出时目标路径只是归档内的条目名，磁盘上的同名文件不算冲突
+        if mode != 'archive' and (entry['conflict'] == RenamePlanner.CONFLICT_DISK or dir_cache.exists(dst)):
+            if on_conflict == 'skip':
+                conflicts += 1
+                continue
+            if on_conflict == 'keep-both':
+                dst = dir_cache.next_free(dst, reserve=True)
+        else:
+            dir_cache.add(dst)
+        ops.append({'src': entry['src'], 'dst': dst, 'action': mode,
+                    'parse': {'rel_no': row.get('rel_no'), 'std_cp': row.get('std_cp'),
+                              'detail': row.get('detail'), 'type': row.get('type'),
+                              'unit_data': {'Test': row.get('test')}}})
+
+    manifest = BatchManifest(journal_dir)
+    check = preflight(ops, mode=mode, history=ThroughputHistory(manifest.journal_dir), throttle=throttle)
+    summary_text = format_preflight(check)
+    if not check['enough_space'] and not force:
+        return {'aborted': "目标盘空间不足", 'preflight': summary_text}
+
+    # 预检通过后才创建目标文件夹；打包导出不在磁盘上创建目标文件夹
+    if mode != 'archive':
+        for op in ops:
+            dir_cache.ensure_dir(os.path.dirname(op['dst']))
+
+    meta = {'plan': os.path.abspath(path)}
+    if mode == 'transcode':
+        transcoder = transcoder or Transcoder(durability=durability, workers_per_group=workers_per_group,
+                                             throttle=throttle)
+        transcoder.assign_cold_paths(ops, dir_cache)
+        meta['transcode'] = transcoder.options()
+    elif mode == 'archive':
+        archiver = archiver or ArchiveExporter(durability=durability, throttle=throttle)
+        archiver.assign_archives(ops, dir_cache)
+        meta['archive'] = archiver.options()
+
+    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    manifest_path = manifest.save(batch_id, ops, mode=mode, **meta)
+    result = execute_manifest(manifest_path, workers_per_group, on_result, is_cancelled,
+                              durability=durability, throttle=throttle)
+    result.update({'planned': len(rows), 'not_ready': len(rows) - len(ready), 'conflicts': conflicts,
+                   'preflight': summary_text})
+    return result
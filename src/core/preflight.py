@@ -0,0 +1,218 @@
+import os
+import json
+import shutil
+from loguru import logger
+
+# 目标盘至少保留的余量
+FREE_SPACE_RESERVE = 100 * 1024 * 1024
+
+
+def _device_of(path, cache):
+    """路径所在设备号 (不存在时向上找到已存在的父目录)，返回 (设备号, 实际探测的目录)"""
+    probe = path
+    while probe:
+        if probe in cache:
+            return cache[probe]
+        try:
+            cache[probe] = (os.stat(probe).st_dev, probe)
+            return cache[probe]
+        except OSError:
+            parent = os.path.dirname(probe)
+            if parent == probe:
+                return None, None
+            probe = parent
+    return None, None
+
+
+def stat_sources(ops):
+    """
+    按源目录批量取大小/修改时间：每个目录只 os.scandir 一次 (Windows 上 DirEntry.stat 不需要额外系统调用)，
+    结果写回 op['size'] / op['mtime']。找不到的源文件 size 为 None。
+    """
+    by_dir = {}
+    for op in ops:
+        by_dir.setdefault(os.path.dirname(op['src']), []).append(op)
+
+    for dir_path, dir_ops in by_dir.items():
+        wanted = {os.path.basename(op['src']): op for op in dir_ops}
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    op = wanted.get(entry.name)
+                    if op is None:
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    op['size'] = st.st_size
+                    op['mtime'] = st.st_mtime
+        except OSError:
+            pass
+        for op in dir_ops:
+            op.setdefault('size', None)
+            op.setdefault('mtime', None)
+    return ops
+
+
+def preflight(ops, mode='move', history=None, throttle=None):
+    """
+    执行前检查：源文件总量、各目标盘需要的空间 (同盘移动/链接不占新空间)、剩余空间、预计耗时
+    Args:
+        ops: [{'src', 'dst', 'action'(可选)}, ...]
+        history: ThroughputHistory，用于估算耗时
+        throttle: IoThrottle，设置了限速时估算不会低于限速所需的时间
+    Returns:
+        {'files', 'bytes', 'data_bytes', 'missing', 'volumes': [{'path', 'need', 'free', 'ok'}],
+         'enough_space', 'estimate_seconds'}
+    """
+    stat_sources(ops)
+    dev_cache = {}
+    volumes = {}
+    total_bytes = data_bytes = missing = 0
+
+    for op in ops:
+        size = op.get('size')
+        if size is None:
+            missing += 1
+            continue
+        total_bytes += size
+        action = op.get('action') or mode
+        src_dev, _ = _device_of(os.path.dirname(op['src']), dev_cache)
+        dst_dev, probe = _device_of(os.path.dirname(op['dst']), dev_cache)
+        if dst_dev is None:
+            continue
+        vol = volumes.setdefault(dst_dev, {'path': probe, 'need': 0})
+        same = src_dev is not None and src_dev == dst_dev
+        if same and action in ('move', 'hardlink', 'reflink'):
+            # 同一文件系统内改名/链接/克隆：不占新空间
+            continue
+        vol['need'] += size
+        data_bytes += size
+
+    enough = True
+    for vol in volumes.values():
+        try:
+            vol['free'] = shutil.disk_usage(vol['path']).free
+        except OSError:
+            vol['free'] = None
+        vol['ok'] = vol['free'] is None or vol['need'] + FREE_SPACE_RESERVE <= vol['free'] or vol['need'] == 0
+        enough = enough and vol['ok']
+
+    files = len(ops) - missing
+    estimate = history.estimate(files, data_bytes) if history else None
+    if throttle:
+        floor = max(data_bytes / throttle.bytes_bucket.rate if throttle.bytes_bucket.rate else 0,
+                    files / throttle.files_bucket.rate if throttle.files_bucket.rate else 0)
+        if floor:
+            estimate = max(estimate or 0, floor)
+    summary = {
+        'files': files,
+        'bytes': total_bytes,
+        'data_bytes': data_bytes,
+        'missing': missing,
+        'volumes': list(volumes.values()),
+        'enough_space': enough,
+        'estimate_seconds': estimate,
+    }
+    logger.info(f"🧮 预检: {files} 个文件，{format_bytes(total_bytes)}，需写入 {format_bytes(data_bytes)}，"
+                f"{len(volumes)} 个目标盘，空间{'充足' if enough else '不足'}")
+    return summary
+
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"~{max(1, round(seconds))} 秒"
+    if seconds < 3600:
+        return f"~{round(seconds / 60)} 分钟"
+    return f"~{seconds / 3600:.1f} 小时"
+
+
+def format_preflight(summary):
+    """确认框里的一行摘要，如：12,430 个文件，48.2 GB，预计 ~6 分钟，2 个目标盘空间充足"""
+    parts = [f"{summary['files']:,} 个文件", format_bytes(summary['bytes'])]
+    if summary['estimate_seconds'] is not None:
+        parts.append(f"预计 {format_duration(summary['estimate_seconds'])}")
+    n = len(summary['volumes'])
+    if summary['enough_space']:
+        parts.append("目标盘空间充足" if n <= 1 else f"{n} 个目标盘空间均充足")
+    text = "，".join(parts)
+
+    lines = [text]
+    for vol in summary['volumes']:
+        if vol['need'] == 0:
+            continue
+        free = format_bytes(vol['free']) if vol['free'] is not None else "未知"
+        flag = "✅" if vol['ok'] else "❌ 空间不足"
+        lines.append(f"  {flag} {vol['path']}: 需要 {format_bytes(vol['need'])}，剩余 {free}")
+    if summary['missing']:
+        lines.append(f"  ⚠️ {summary['missing']} 个源文件找不到")
+    return "\n".join(lines)
+
+
+class ThroughputHistory:
+    """
+    历次批次的吞吐记录 (journal 目录下的 throughput.json，保留最近 MAX_RECORDS 条)，
+    用 耗时 ≈ a × 文件数 + b × 写入字节数 拟合出每文件开销与带宽来估算新批次耗时。
+    """
+
+    MAX_RECORDS = 20
+
+    def __init__(self, journal_dir):
+        self.path = os.path.join(journal_dir, 'throughput.json')
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def record(self, files, bytes, seconds):
+        """参数与 MoveExecutor.last_run 的键一致，bytes 为实际写入的字节数"""
+        if files <= 0 or seconds <= 0:
+            return
+        records = self.load()
+        records.append({'files': files, 'bytes': bytes, 'seconds': seconds})
+        records = records[-self.MAX_RECORDS:]
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(records, f)
+        except OSError as e:
+            logger.warning(f"无法保存吞吐记录: {e}")
+
+    def estimate(self, files, data_bytes):
+        """没有历史记录时返回 None"""
+        records = self.load()
+        if not records:
+            return None
+        a, b = self._fit(records)
+        return a * files + b * data_bytes
+
+    @staticmethod
+    def _fit(records):
+        """非负最小二乘拟合 seconds = a*files + b*bytes (2x2 正规方程)"""
+        sff = sum(r['files'] * r['files'] for r in records)
+        sbb = sum(r['bytes'] * r['bytes'] for r in records)
+        sfb = sum(r['files'] * r['bytes'] for r in records)
+        sfs = sum(r['files'] * r['seconds'] for r in records)
+        sbs = sum(r['bytes'] * r['seconds'] for r in records)
+        det = sff * sbb - sfb * sfb
+        if det > 1e-9 * sff * sbb:
+            a = (sfs * sbb - sbs * sfb) / det
+            b = (sbs * sff - sfs * sfb) / det
+            if a >= 0 and b >= 0:
+                return a, b
+        # 数据不足以分开两项 (只有一条记录，或历史批次都是同盘改名)：按平均每文件耗时估算
+        total_seconds = sum(r['seconds'] for r in records)
+        total_files = sum(r['files'] for r in records)
+        return total_seconds / total_files, 0.0
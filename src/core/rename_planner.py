@@ -0,0 +1,73 @@
+import os
+from loguru import logger
+from src.core.dir_cache import DirectoryCache
+
+
+class RenamePlanner:
+    """
+    重命名计划：在移动任何文件之前，一次性构建完整的 src -> dst 映射，
+    用哈希表找出批内重复目标，并按目录批量检查磁盘上已存在的目标。
+    """
+
+    # 冲突类型
+    CONFLICT_BATCH = 'batch'  # 批内有多个源文件指向同一个目标
+    CONFLICT_DISK = 'disk'    # 目标文件在磁盘上已存在
+
+    @staticmethod
+    def path_key(path):
+        """用于比较路径是否相同的 Key (Windows 下忽略大小写)"""
+        return os.path.normcase(os.path.normpath(path))
+
+    @classmethod
+    def build_plan(cls, tasks, dir_cache=None):
+        """
+        Args:
+            tasks: [(row_index, src, dst), ...]
+            dir_cache: DirectoryCache，传入后执行阶段可复用同一份目录列表
+        Returns:
+            (entries, summary)
+            entries: [{'index', 'src', 'dst', 'conflict', 'conflict_with'}, ...] 顺序同 tasks
+            summary: {'total', 'batch_collisions', 'disk_conflicts'}
+        """
+        entries = []
+        first_owner = {}  # 目标 Key -> 第一个占用它的条目
+
+        # 1. 批内查重 (哈希表，O(n))
+        for index, src, dst in tasks:
+            entry = {'index': index, 'src': src, 'dst': dst, 'conflict': None, 'conflict_with': None}
+            entries.append(entry)
+            if not dst:
+                continue
+            key = cls.path_key(dst)
+            owner = first_owner.get(key)
+            if owner is None:
+                first_owner[key] = entry
+            else:
+                entry['conflict'] = cls.CONFLICT_BATCH
+                entry['conflict_with'] = owner['src']
+
+        # 2. 磁盘冲突：每个目标目录只列一次
+        if dir_cache is None:
+            dir_cache = DirectoryCache()
+        by_dir = {}
+        for entry in first_owner.values():
+            by_dir.setdefault(os.path.dirname(entry['dst']), []).append(entry)
+
+        for dir_path, dir_entries in by_dir.items():
+            existing = dir_cache.list_names(dir_path)
+            if not existing:
+                continue
+            for entry in dir_entries:
+                # 源文件本身就在目标位置 (重复执行) 不算冲突
+                if cls.path_key(entry['src']) == cls.path_key(entry['dst']):
+                    continue
+                if os.path.normcase(os.path.basename(entry['dst'])) in existing:
+                    entry['conflict'] = cls.CONFLICT_DISK
+
+        summary = {
+            'total': len(entries),
+            'batch_collisions': sum(1 for e in entries if e['conflict'] == cls.CONFLICT_BATCH),
+            'disk_conflicts': sum(1 for e in entries if e['conflict'] == cls.CONFLICT_DISK),
+        }
+        logger.info(f"📋 重命名计划: {summary}")
+        return entries, summary
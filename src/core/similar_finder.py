@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
+from src.utils.file_cache import FileCache
+
+# dHash 边长：8 -> 64 位
+HASH_SIZE = 8
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """
+    差值哈希 (dHash)：缩成 (hash_size+1) x hash_size 的灰度图，逐行比较相邻像素明暗。
+    JPEG 用 draft 模式让解码器直接按 1/2~1/8 比例解码，不解出完整的 12MP 像素。
+    在子进程中运行，返回 (path, 十六进制哈希 或 None, 错误信息)
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as im:
+            im.draft('L', ((hash_size + 1) * 8, hash_size * 8))
+            small = im.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+            px = list(small.getdata())
+        bits = 0
+        for row in range(hash_size):
+            base = row * (hash_size + 1)
+            for col in range(hash_size):
+                bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+        return path, f"{bits:0{hash_size * hash_size // 4}x}", None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """汉明距离 BK 树：按半径查询只走距离满足三角不等式的分支，避免两两比较"""
+
+    def __init__(self):
+        self.root = None  # [hash, item, {distance: child}]
+
+    def add(self, h, item):
+        node = [h, item, {}]
+        if self.root is None:
+            self.root = node
+            return
+        cur = self.root
+        while True:
+            d = hamming(h, cur[0])
+            child = cur[2].get(d)
+            if child is None:
+                cur[2][d] = node
+                return
+            cur = child
+
+    def query(self, h, radius):
+        """返回距离 <= radius 的 [item, ...]"""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                found.append(node[1])
+            for dist, child in node[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return found
+
+
+class SimilarFinder:
+    """
+    近似重复查找 (同一检查点同一方向重拍了好几张)：
+    每张照片的 dHash 在进程池中计算并按 (路径, 大小, 修改时间) 持久化缓存；
+    只在同一 (机台号, CP, 方向/失效描述) 分组内用 BK 树查找汉明距离 <= threshold 的照片。
+    """
+
+    DEFAULT_THRESHOLD = 6
+
+    def __init__(self, workers=None, cache=None):
+        self.workers = workers or os.cpu_count() or 2
+        self.cache = cache or FileCache('dhash')
+
+    def compute_hashes(self, paths, on_progress=None, is_cancelled=None):
+        """
+        Returns: {path: int 哈希}，读取失败的文件不在结果中
+        """
+        hashes = {}
+        todo = []
+        for p in paths:
+            cached = self.cache.get(FileCache.key_for(p))
+            if cached is not None:
+                hashes[p] = int(cached, 16)
+            else:
+                todo.append(p)
+
+        done = len(hashes)
+        if on_progress:
+            on_progress(done, len(paths))
+        if todo:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(dhash, p) for p in todo]
+                for fut in as_completed(futures):
+                    path, value, error = fut.result()
+                    if value is not None:
+                        hashes[path] = int(value, 16)
+                        self.cache.set(FileCache.key_for(path), value)
+                    else:
+                        logger.warning(f"无法计算感知哈希 {path}: {error}")
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(paths))
+                    if is_cancelled and is_cancelled():
+                        for f in futures:
+                            f.cancel()
+                        break
+            self.cache.save()
+        logger.info(f"🖼️ 感知哈希: {len(paths)} 张，其中缓存命中 {len(paths) - len(todo)} 张")
+        return hashes
+
+    def find(self, items, threshold=DEFAULT_THRESHOLD, on_progress=None, is_cancelled=None):
+        """
+        Args:
+            items: [(path, group_key), ...]，group_key 相同的照片之间才比较
+        Returns:
+            相似组列表 [[path, ...], ...] (每组 2 张以上，按 items 顺序)
+        """
+        order = {p: i for i, (p, _) in enumerate(items)}
+        hashes = self.compute_hashes([p for p, _ in items], on_progress, is_cancelled)
+
+        by_group = {}
+        for path, key in items:
+            if path in hashes:
+                by_group.setdefault(key, []).append(path)
+
+        # 并查集：BK 树里查到的近邻并入同一组
+        parent = {}
+
+        def find_root(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for paths in by_group.values():
+            if len(paths) < 2:
+                continue
+            tree = BKTree()
+            for p in paths:
+                parent[p] = p
+                for other in tree.query(hashes[p], threshold):
+                    parent[find_root(other)] = find_root(p)
+                tree.add(hashes[p], p)
+
+        groups = {}
+        for p in parent:
+            groups.setdefault(find_root(p), []).append(p)
+        result = [sorted(g, key=order.get) for g in groups.values() if len(g) > 1]
+        result.sort(key=lambda g: order[g[0]])
+        logger.info(f"🔍 发现 {len(result)} 组相似照片")
+        return result
@@ -0,0 +1,215 @@
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from loguru import logger
+from src.core.move_executor import MoveExecutor, fsync_path, fsync_dir
+
+# 这些扩展名按 JPEG 重新压缩，其他格式只缩小尺寸、保持原格式
+JPEG_EXTS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+DEFAULT_MAX_DIMENSION = 2048
+DEFAULT_QUALITY = 85
+
+TAG_ORIENTATION = 0x0112
+
+
+def transcode_image(src, dst, max_dimension=DEFAULT_MAX_DIMENSION, quality=DEFAULT_QUALITY, sync=False):
+    """
+    在子进程中运行：把 src 缩小到长边不超过 max_dimension (0 表示不缩小)、按 quality 重新压缩后
+    写到 dst + ".part" (输出格式按 dst 的扩展名决定，由调用方原子替换为 dst)。
+    先按 EXIF 方向摆正像素，再把方向标记改为 1；其余 EXIF 和 ICC 配置文件原样保留。
+    JPEG 用 draft 模式直接按 1/2~1/8 比例解码，不解出完整的 12MP 像素。
+    返回 (src, 输出大小, 错误信息 或 None)
+    """
+    part = dst + ".part"
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(src) as im:
+            fmt = 'JPEG' if os.path.splitext(dst)[1].lower() in JPEG_EXTS else im.format
+            exif = im.getexif()
+            icc = im.info.get('icc_profile')
+            if max_dimension:
+                im.draft('RGB', (max_dimension, max_dimension))
+            out = ImageOps.exif_transpose(im)
+        if max_dimension:
+            out.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if fmt == 'JPEG' and out.mode not in ('RGB', 'L'):
+            out = out.convert('RGB')
+        if TAG_ORIENTATION in exif:
+            exif[TAG_ORIENTATION] = 1
+
+        params = {'exif': exif.tobytes()}
+        if icc:
+            params['icc_profile'] = icc
+        if fmt == 'JPEG':
+            params.update(quality=quality, optimize=True)
+        out.save(part, fmt, **params)
+        # 保留原文件的修改时间 (按时间排序/归档的工具依赖它)
+        shutil.copystat(src, part)
+        if sync:
+            fsync_path(part)
+        return src, os.path.getsize(part), None
+    except Exception as e:
+        return src, None, str(e) or type(e).__name__
+
+
+class Transcoder:
+    """
+    转码导出执行器 (output_mode = transcode)：目标写入缩小/重新压缩后的副本，而不是搬运原始字节。
+    解码/编码是 CPU 密集型，用与 CPU 核数相同的进程池并行；接口与 MoveExecutor.run() 一致。
+    原文件默认保留在原处；设置了冷存储目录 (cold_dir) 时，转码成功后把原文件移到 op['cold']
+    (路径在规划阶段由 assign_cold_paths 预先分配并写入批次清单，撤销时据此移回)。
+    冷存储移动是纯 I/O，交给 MoveExecutor (按设备分组并行，跨设备校验复制后才删除原文件，遵守 throttle)；
+    转码本身不经过 throttle：并发已由进程数限制，瓶颈是 CPU 而不是磁盘。
+    """
+
+    def __init__(self, max_dimension=DEFAULT_MAX_DIMENSION, quality=DEFAULT_QUALITY, cold_dir='',
+                 durability='none', workers=None, workers_per_group=4, throttle=None):
+        self.max_dimension = max(0, int(max_dimension or 0))
+        self.quality = min(100, max(1, int(quality or DEFAULT_QUALITY)))
+        self.cold_dir = cold_dir or ''
+        self.durability = durability
+        self.workers = workers or os.cpu_count() or 2
+        # 冷存储移动用的每设备组线程数与限速
+        self.workers_per_group = workers_per_group
+        self.throttle = throttle
+        # 转码耗时取决于 CPU 而不是磁盘，不计入吞吐历史
+        self.last_run = None
+
+    @classmethod
+    def from_settings(cls, exec_cfg, durability='none', throttle=None):
+        return cls(max_dimension=exec_cfg.get('transcode_max_dimension', DEFAULT_MAX_DIMENSION),
+                   quality=exec_cfg.get('transcode_quality', DEFAULT_QUALITY),
+                   cold_dir=exec_cfg.get('cold_dir', ''),
+                   durability=durability,
+                   workers_per_group=exec_cfg.get('workers_per_device', 4),
+                   throttle=throttle)
+
+    def options(self):
+        """写入批次清单的参数，继续执行中断的批次时按同样的参数转码"""
+        return {'max_dimension': self.max_dimension, 'quality': self.quality, 'cold_dir': self.cold_dir}
+
+    def assign_cold_paths(self, ops, dir_cache):
+        """为每个原文件预留冷存储路径 (目标文件名 + 原扩展名，重名时加后缀)，写入 op['cold']"""
+        if not self.cold_dir:
+            return
+        dir_cache.ensure_dir(self.cold_dir)
+        for op in ops:
+            stem = os.path.splitext(os.path.basename(op['dst']))[0]
+            ext = os.path.splitext(op['src'])[1]
+            op['cold'] = dir_cache.next_free(os.path.join(self.cold_dir, stem + ext), reserve=True)
+
+    def move_to_cold(self, ops, on_moved=None, is_cancelled=None):
+        """
+        把已转码项的原文件 op['src'] 移到 op['cold']。移动失败或被取消时原文件留在原处、op['cold'] 置为 None，
+        不算失败 (转码结果已经落地)。on_moved(op) 在调用线程中对每项触发一次。
+        """
+        if not ops:
+            return
+        for folder in {os.path.dirname(op['cold']) for op in ops}:
+            os.makedirs(folder, exist_ok=True)
+        moves = [{'src': op['src'], 'dst': op['cold'], 'action': 'move', 'op': op} for op in ops]
+
+        def finish(move, done, total):
+            op = move['op']
+            if move['status'] != 'ok':
+                if move['status'] == 'error':
+                    logger.warning(f"无法移到冷存储 {move['src']} -> {move['dst']}: {move['error']}")
+                op['cold'] = None
+            if on_moved:
+                on_moved(op)
+
+        MoveExecutor(workers_per_group=self.workers_per_group, durability=self.durability,
+                     throttle=self.throttle).run(moves, on_result=finish, is_cancelled=is_cancelled)
+
+    def run(self, ops, on_result=None, is_cancelled=None):
+        """
+        Args / Returns: 同 MoveExecutor.run()；每项另外补充 'out_size' (输出大小)。
+        需要移到冷存储的项在原文件移动完成后才回调。
+        """
+        if not ops:
+            return ops
+
+        logger.info(f"🗜️ 转码导出 {len(ops)} 项 (长边 ≤ {self.max_dimension or '原尺寸'}，质量 {self.quality})，"
+                    f"{self.workers} 个进程")
+        sync = self.durability != 'none'
+        pending = {}
+        cold_ops = []
+        done = 0
+        cancelled = False
+
+        def report(op):
+            nonlocal done
+            done += 1
+            if on_result:
+                on_result(op, done, len(ops))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for op in ops:
+                op['action'] = 'transcode'
+                op['started'] = time.perf_counter()
+                try:
+                    st = os.stat(op['src'])
+                    op['size'] = st.st_size
+                    op['mtime'] = st.st_mtime
+                except OSError as e:
+                    self._finish(op, error=str(e))
+                    report(op)
+                    continue
+                pending[pool.submit(transcode_image, op['src'], op['dst'],
+                                    self.max_dimension, self.quality, sync)] = op
+
+            for fut in as_completed(pending):
+                op = pending[fut]
+                if fut.cancelled():
+                    op['status'] = 'cancelled'
+                    op['error'] = "用户取消"
+                else:
+                    _, out_size, error = fut.result()
+                    self._finish(op, out_size, error)
+                if op['status'] == 'ok' and op.get('cold'):
+                    cold_ops.append(op)
+                else:
+                    report(op)
+                if not cancelled and is_cancelled and is_cancelled():
+                    cancelled = True
+                    for f in pending:
+                        f.cancel()
+
+        # 原文件移到冷存储：转码全部落地后统一交给 MoveExecutor；已取消时原文件留在原处
+        if cancelled:
+            for op in cold_ops:
+                op['cold'] = None
+                report(op)
+        else:
+            self.move_to_cold(cold_ops, on_moved=report, is_cancelled=is_cancelled)
+
+        ok_ops = [op for op in ops if op.get('status') == 'ok']
+        if ok_ops:
+            in_bytes = sum(op['size'] for op in ok_ops)
+            out_bytes = sum(op['out_size'] for op in ok_ops)
+            logger.info(f"🗜️ 转码完成 {len(ok_ops)} 项: {in_bytes / 1048576:.1f} MB -> {out_bytes / 1048576:.1f} MB")
+        return ops
+
+    def _finish(self, op, out_size=None, error=None):
+        """在调用线程中收尾：把子进程写好的 .part 原子替换为目标文件"""
+        part = op['dst'] + ".part"
+        try:
+            if error:
+                raise OSError(error)
+            os.replace(part, op['dst'])
+            if self.durability in ('files_dirs', 'per_file'):
+                fsync_dir(os.path.dirname(op['dst']))
+            op['out_size'] = out_size
+            op['status'] = 'ok'
+            op['error'] = None
+        except Exception as e:
+            if os.path.exists(part):
+                try:
+                    os.remove(part)
+                except OSError:
+                    pass
+            op['status'] = 'error'
+            op['error'] = str(e)
+        op['elapsed'] = time.perf_counter() - op.pop('started', time.perf_counter())
@@ -0,0 +1,183 @@
+import os
+from datetime import datetime
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QDialogButtonBox
+)
+from PySide6.QtGui import QColor
+
+# 处理方式 (与旧版 ConflictDialog 的编码一致)
+ACTION_OVERWRITE = 1
+ACTION_SKIP = 2
+ACTION_KEEP_BOTH = 3
+
+ACTION_NAMES = {
+    ACTION_OVERWRITE: "覆盖",
+    ACTION_SKIP: "跳过",
+    ACTION_KEEP_BOTH: "保留两者",
+}
+
+ACTION_COLORS = {
+    ACTION_OVERWRITE: "#D32F2F",
+    ACTION_SKIP: "#8E8E93",
+    ACTION_KEEP_BOTH: "#2E7D32",
+}
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime
+    except OSError:
+        return None, None
+
+
+def _fmt_size(size):
+    if size is None:
+        return "-"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def _fmt_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "-"
+
+
+class ConflictReviewDialog(QDialog):
+    """
+    批量冲突审查：规划阶段找出的所有"目标已存在"一次性列出，
+    可以按规则 (如 大小相同 -> 跳过) 或逐行 (选中后点按钮) 决定处理方式，
+    确认后整批无人值守执行，执行过程中不再弹窗。
+    """
+
+    COL_SRC, COL_DST, COL_SRC_SIZE, COL_DST_SIZE, COL_DST_TIME, COL_ACTION = range(6)
+
+    def __init__(self, entries, parent=None):
+        """
+        Args:
+            entries: 规划结果中 conflict == disk 的条目 [{'index', 'src', 'dst', ...}, ...]
+        """
+        super().__init__(parent)
+        self.setWindowTitle(f"目标文件已存在 - 冲突审查 ({len(entries)} 项)")
+        self.resize(1000, 600)
+
+        self.rows = []
+        for entry in entries:
+            src_size, _ = _stat(entry['src'])
+            dst_size, dst_mtime = _stat(entry['dst'])
+            self.rows.append({'index': entry['index'], 'src': entry['src'], 'dst': entry['dst'],
+                              'src_size': src_size, 'dst_size': dst_size, 'dst_mtime': dst_mtime,
+                              'action': ACTION_KEEP_BOTH})
+
+        layout = QVBoxLayout(self)
+
+        info = QLabel(f"<h3>{len(entries)} 个目标文件已存在</h3>"
+                      f"<p style='color:#666'>先按规则批量设置，再对个别行单独调整 (可多选)。确认后整批执行，不再逐个询问。</p>")
+        info.setWordWrap(True)
+        layout.addWidget(info)
+
+        # 1. 规则
+        rule_layout = QHBoxLayout()
+        rule_layout.addWidget(QLabel("大小相同时:"))
+        self.cmb_same = self._action_combo(ACTION_SKIP)
+        rule_layout.addWidget(self.cmb_same)
+        rule_layout.addSpacing(12)
+        rule_layout.addWidget(QLabel("大小不同时:"))
+        self.cmb_diff = self._action_combo(ACTION_KEEP_BOTH)
+        rule_layout.addWidget(self.cmb_diff)
+        btn_rule = QPushButton("应用规则")
+        btn_rule.clicked.connect(self.apply_rules)
+        rule_layout.addWidget(btn_rule)
+        rule_layout.addStretch()
+        layout.addLayout(rule_layout)
+
+        # 2. 冲突列表
+        self.table = QTableWidget(len(self.rows), 6)
+        self.table.setHorizontalHeaderLabels(["原文件", "目标路径", "原文件大小", "已有文件大小", "已有文件修改时间", "处理方式"])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(self.COL_DST, QHeaderView.Stretch)
+        self.table.setColumnWidth(self.COL_SRC, 220)
+        self._fill_table()
+        layout.addWidget(self.table)
+
+        # 3. 选中行的处理方式
+        row_layout = QHBoxLayout()
+        row_layout.addWidget(QLabel("选中行:"))
+        for action in (ACTION_OVERWRITE, ACTION_SKIP, ACTION_KEEP_BOTH):
+            btn = QPushButton(ACTION_NAMES[action])
+            btn.clicked.connect(lambda _=False, a=action: self.set_selected(a))
+            row_layout.addWidget(btn)
+        row_layout.addStretch()
+        self.lbl_summary = QLabel()
+        row_layout.addWidget(self.lbl_summary)
+        layout.addLayout(row_layout)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText("确认并执行")
+        buttons.button(QDialogButtonBox.Cancel).setText("取消")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        # 打开时先按默认规则设置一次
+        self.apply_rules()
+
+    @staticmethod
+    def _action_combo(default):
+        cmb = QComboBox()
+        for action in (ACTION_OVERWRITE, ACTION_SKIP, ACTION_KEEP_BOTH):
+            cmb.addItem(ACTION_NAMES[action], action)
+        cmb.setCurrentIndex(cmb.findData(default))
+        return cmb
+
+    def _fill_table(self):
+        self.table.setUpdatesEnabled(False)
+        for r, row in enumerate(self.rows):
+            same = row['src_size'] is not None and row['src_size'] == row['dst_size']
+            values = [os.path.basename(row['src']), row['dst'], _fmt_size(row['src_size']),
+                      _fmt_size(row['dst_size']), _fmt_time(row['dst_mtime']), ""]
+            for c, text in enumerate(values):
+                item = QTableWidgetItem(text)
+                if c == self.COL_DST:
+                    item.setToolTip(text)
+                if c == self.COL_DST_SIZE and same:
+                    item.setForeground(QColor("#1565C0"))
+                self.table.setItem(r, c, item)
+        self.table.setUpdatesEnabled(True)
+
+    def _set_action(self, r, action):
+        self.rows[r]['action'] = action
+        item = self.table.item(r, self.COL_ACTION)
+        item.setText(ACTION_NAMES[action])
+        item.setForeground(QColor(ACTION_COLORS[action]))
+
+    def _update_summary(self):
+        counts = {a: 0 for a in ACTION_NAMES}
+        for row in self.rows:
+            counts[row['action']] += 1
+        self.lbl_summary.setText("   ".join(f"{ACTION_NAMES[a]}: {n}" for a, n in counts.items()))
+
+    def apply_rules(self):
+        same_action = self.cmb_same.currentData()
+        diff_action = self.cmb_diff.currentData()
+        self.table.setUpdatesEnabled(False)
+        for r, row in enumerate(self.rows):
+            same = row['src_size'] is not None and row['src_size'] == row['dst_size']
+            self._set_action(r, same_action if same else diff_action)
+        self.table.setUpdatesEnabled(True)
+        self._update_summary()
+
+    def set_selected(self, action):
+        for index in self.table.selectionModel().selectedRows():
+            self._set_action(index.row(), action)
+        self._update_summary()
+
+    def decisions(self):
+        """{行号(预览表中的 index): ACTION_*}"""
+        return {row['index']: row['action'] for row in self.rows}
@@ -1,12 +1,14 @@
 import os
-import shutil
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QHeaderView, QSizePolicy, QFileDialog, QMessageBox, QCheckBox, QDialog, QDialogButtonBox
+    QHeaderView, QSizePolicy, QFileDialog, QMessageBox,
+    QProgressDialog, QApplication
 )
-from PySide6.QtCore import Qt, Slot
+from PySide6.QtCore import Qt, Slot, QTimer
+from loguru import logger
 from src.ui.components.preview_table import PreviewTable
 from src.ui.components.status_bar import StatusBar
+from src.ui.components.conflict_review_dialog import ConflictReviewDialog, ACTION_SKIP, ACTION_KEEP_BOTH
 from src.ui.models.photo_table_model import PhotoTableModel
 from src.ui.settings_dialog import SettingsDialog
 from src.core.config_manager import ConfigManager
@@ -14,6 +16,21 @@ from src.core.excel_engine import ExcelEngine
 from src.core.parser_engine import ParserEngine
 from src.core.file_processor import FileProcessor
 from src.core.learner import Learner
+from src.core.rename_planner import RenamePlanner
+from src.core.dir_cache import DirectoryCache
+from src.core.move_executor import MoveExecutor
+from src.core.io_throttle import IoThrottle
+from src.core.preflight import ThroughputHistory, preflight, format_preflight, format_bytes
+from src.core.duplicate_finder import DuplicateFinder
+from src.core.similar_finder import SimilarFinder
+from src.core.integrity_checker import IntegrityChecker
+from src.core.contact_sheet import ContactSheetBuilder, SHEET_NAME
+from src.core.transcoder import Transcoder
+from src.core.archive_exporter import ArchiveExporter
+from src.core.batch_undo import undo_batch
+from src.core.batch_manifest import BatchManifest, inspect_manifest, resume_batch, rollback_batch
+from src.core.plan_file import build_plan_rows, write_plan
+from src.utils.rename_journal import RenameJournal
 from src.utils.constants import COLOR_GREEN, COLOR_YELLOW, COLOR_ORANGE, COLOR_RED, SUPPORTED_IMAGE_FORMATS
 from src.utils.operation_logger import get_operation_logger
 
@@ -33,6 +50,8 @@ class MainWindow(QMainWindow):
         self.excel_engine = ExcelEngine()
         self.parser_engine = ParserEngine(self.excel_engine, self.settings, self.cp_map, self.issue_map,self.orient_map)
         self.file_processor = FileProcessor(self.settings)
+        self.duplicate_finder = DuplicateFinder()
+        self.loaded_sheet_setting = None
 
         self.init_ui()
 
@@ -56,6 +75,9 @@ class MainWindow(QMainWindow):
             self.btn_issue_dir.setText(f"📂 失效照输出路径: {os.path.basename(last_issue_out)}")
             self.btn_issue_dir.setToolTip(last_issue_out)
 
+        # 4. 上次有未完成的批次 (崩溃/断电/取消)：窗口显示后询问继续还是回滚
+        QTimer.singleShot(0, self.check_pending_batches)
+
     def init_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -70,7 +92,7 @@ class MainWindow(QMainWindow):
 
         left_panel = QWidget()
         left_layout = QVBoxLayout(left_panel)
-        self.btn_excel = QPushButton("📄 导入机台信息CSV格式的文件")
+        self.btn_excel = QPushButton("📄 导入机台信息表 (CSV / XLSX)")
         self.btn_excel.clicked.connect(self.browse_excel)
         self.btn_reg_dir = QPushButton("📂 选择标准照输出文件夹")
         self.btn_reg_dir.clicked.connect(lambda: self.browse_output('regular'))
@@ -89,7 +111,23 @@ class MainWindow(QMainWindow):
         self.btn_settings.clicked.connect(self.open_settings)
         self.btn_clear = QPushButton("🗑️ 清空列表")
         self.btn_clear.clicked.connect(self.clear_table)
+        self.btn_reload = QPushButton("🔄 重载数据表")
+        self.btn_reload.setToolTip("数据表被修改后点击，只重新解析有变化的机台")
+        self.btn_reload.clicked.connect(self.reload_excel)
         top_btns.addWidget(self.btn_settings)
+        top_btns.addWidget(self.btn_reload)
+        self.btn_undo = QPushButton("↩️ 撤销上一批")
+        self.btn_undo.setToolTip("按批次日志把上一批已处理的文件移回原位置")
+        self.btn_undo.clicked.connect(self.undo_last_batch)
+        top_btns.addWidget(self.btn_undo)
+        self.btn_export = QPushButton("📤 导出计划")
+        self.btn_export.setToolTip("只生成重命名计划 (CSV / JSONL)，不移动文件；可用 main.py --run-plan 稍后执行")
+        self.btn_export.clicked.connect(self.export_plan)
+        top_btns.addWidget(self.btn_export)
+        self.btn_similar = QPushButton("🔍 相似照片")
+        self.btn_similar.setToolTip("按感知哈希找出同一机台/CP/方向下几乎一样的重拍照片")
+        self.btn_similar.clicked.connect(self.find_similar)
+        top_btns.addWidget(self.btn_similar)
         top_btns.addWidget(self.btn_clear)
 
         self.btn_start = QPushButton("▶ 开始重命名")
@@ -176,8 +214,10 @@ class MainWindow(QMainWindow):
             if new_excel and os.path.exists(new_excel):
                 # 如果路径变了，或者当前没加载 Excel，则重新加载
                 current_excel_text = self.btn_excel.toolTip()
-                if new_excel != current_excel_text:
-                    self.load_excel(new_excel)
+                new_sheet = last_session.get('excel_sheet') or None
+                if new_excel != current_excel_text or new_sheet != self.loaded_sheet_setting:
+                    # 下面会整表刷新，这里不重复解析
+                    self.load_excel(new_excel, refresh=False)
 
             # 2. 检查 Regular Output 变更
             new_reg = last_session.get('regular_output_dir')
@@ -196,21 +236,34 @@ class MainWindow(QMainWindow):
             
             self.status_bar.update_status(self.model.rowCount(), 0, "设置已重载，列表已刷新")
 
-    def refresh_list(self):
+    def refresh_list(self, rel_keys=None):
         """
         当设置发生变化时（如非法字符、映射表等），
         重新遍历当前列表中的所有文件，使用新配置重新解析。
+        rel_keys: 仅重新解析属于这些机台规范 Key 的行 (以及尚未匹配到机台的行)，None 表示全部
         """
         if self.model.rowCount() == 0:
             return
         
-        updated_count = 0
+        # 1. 重新解析
+        updates = []
         for i, item in enumerate(self.model.data_list):
             src_path = item['original_path']
-            
-            # 1. 重新解析
+
+            if rel_keys is not None:
+                rel_no = item['parse_result'].get('rel_no')
+                if rel_no and self.excel_engine.canonical_key(rel_no) not in rel_keys:
+                    continue
+
             new_res = self.parser_engine.parse_filename(src_path)
-            
+            # 文件没变，已读过的 EXIF 直接沿用
+            new_res['exif'] = item['parse_result'].get('exif')
+            updates.append((i, new_res))
+
+        self.prefetch_exif([res for _, res in updates])
+
+        updated_count = 0
+        for i, new_res in updates:
             # 2. 重新生成目标路径
             target_path, target_name = self.file_processor.generate_target_path(new_res)
             new_res['target_filename'] = target_name
@@ -220,26 +273,47 @@ class MainWindow(QMainWindow):
             self.model.update_row(i, new_res)
             updated_count += 1
 
+        # 重新解析会覆盖状态，内容重复按当前列表重新标记
+        if updates:
+            self.flag_duplicates()
         print(f"Refreshed {updated_count} items with new settings.")
+        return updated_count
 
     def browse_excel(self):
         # 🔥 修改点：过滤器改为 *.csv
-        path, _ = QFileDialog.getOpenFileName(self, "选择机台信息CSV文件", "", "CSV Files (*.csv);;All Files (*)")
+        path, _ = QFileDialog.getOpenFileName(self, "选择机台信息表", "",
+                                              "Data Files (*.csv *.xlsx *.xlsm);;CSV Files (*.csv);;"
+                                              "Excel Files (*.xlsx *.xlsm);;All Files (*)")
         if path:
             self.load_excel(path)
             self.settings['last_session']['excel_path'] = path
             ConfigManager.save_settings(self.settings)
 
-    def load_excel(self, path):
-        ok, msg = self.excel_engine.load_excel(path, self.settings['excel_header_map'])
+    def load_excel(self, path, refresh=True):
+        # XLSX 可指定工作表，留空则自动识别含表头的工作表
+        sheet_name = self.settings['last_session'].get('excel_sheet') or None
+        # 同一文件再次加载时走增量重载，只重新解析变更机台对应的行
+        ok, msg, changed_keys = self.excel_engine.reload_excel(
+            path, self.settings['excel_header_map'], sheet_name=sheet_name)
         if ok:
-            # 🔥 修改点：显示文本改为 CSV
-            self.btn_excel.setText(f"📄 CSV: {os.path.basename(path)}")
+            self.loaded_sheet_setting = sheet_name
+            label = "XLSX" if path.lower().endswith(ExcelEngine.XLSX_EXTS) else "CSV"
+            if label == "XLSX" and self.excel_engine.sheet_name:
+                label += f" [{self.excel_engine.sheet_name}]"
+            self.btn_excel.setText(f"📄 {label}: {os.path.basename(path)}")
             self.btn_excel.setToolTip(path)
-            self.status_bar.update_status(0, 0, "CSV 已加载")
+            refreshed = (self.refresh_list(changed_keys) or 0) if refresh else 0
+            self.status_bar.update_status(self.model.rowCount(), 0, f"数据表已加载 ({msg}，刷新 {refreshed} 行)")
         else:
             QMessageBox.critical(self, "Error", msg)
 
+    def reload_excel(self):
+        path = self.excel_engine.loaded_path or self.settings['last_session'].get('excel_path')
+        if not path or not os.path.exists(path):
+            QMessageBox.warning(self, "Warning", "请先加载机台信息表 (CSV / XLSX)！")
+            return
+        self.load_excel(path)
+
     def browse_output(self, type_):
         title = "选择标准照输出文件夹" if type_ == 'regular' else "选择问题照输出文件夹"
         path = QFileDialog.getExistingDirectory(self, title)
@@ -278,32 +352,100 @@ class MainWindow(QMainWindow):
         self.process_files(files)
 
     def process_files(self, file_paths):
-        if not self.excel_engine.df is not None:
-            QMessageBox.warning(self, "Warning", "请先加载CSV文件！")
+        if not self.excel_engine.is_loaded():
+            QMessageBox.warning(self, "Warning", "请先加载机台信息表 (CSV / XLSX)！")
             return
 
         results = []
         skipped_count = 0
 
         for f in file_paths:
+            # 交付文件夹里生成的缩略图总览不是待处理的照片 (把交付文件夹拖回来时会带上)
+            if os.path.basename(f) == SHEET_NAME:
+                continue
             # 检查是否已存在
             if self.model.has_file(f):
                 skipped_count += 1
                 continue
 
-            res = self.parser_engine.parse_filename(f)
+            results.append(self.parser_engine.parse_filename(f))
+
+        # 模板用到 EXIF 变量时，先并行读好整批的 EXIF
+        self.prefetch_exif(results)
+        for res in results:
             target_path, target_name = self.file_processor.generate_target_path(res)
             res['target_filename'] = target_name
             res['target_full_path'] = target_path
-            results.append(res)
 
         self.model.add_rows(results)
+        # 按内容查重：同一张照片换了名字从不同的卡导入
+        dup_count = self.flag_duplicates() if results else 0
 
         msg = f"已加载 {len(results)} 个文件"
         if skipped_count > 0:
             msg += f" (跳过 {skipped_count} 个重复项)"
+        if dup_count > 0:
+            msg += f"，{dup_count} 个内容重复已标记为 Duplicate"
         self.status_bar.update_status(self.model.rowCount(), 0, msg)
 
+    def flag_duplicates(self):
+        """把内容完全相同的照片标记为 Duplicate (每组保留列表中最靠前的一张)，返回标记数"""
+        paths = [item['original_path'] for item in self.model.data_list]
+        row_of = {p: i for i, p in enumerate(paths)}
+        count = 0
+        for group in self.duplicate_finder.find(paths):
+            for dup in group[1:]:
+                row = row_of[dup]
+                self.model.data_list[row]['parse_result']['duplicate_of'] = group[0]
+                self.model.mark_row(row, "Duplicate", COLOR_ORANGE)
+                count += 1
+        return count
+
+    def prefetch_exif(self, parse_results):
+        """批量读取模板需要的 EXIF；读取在线程池中进行，这里显示进度并保持界面响应"""
+        progress = QProgressDialog("正在读取 EXIF...", None, 0, len(parse_results), self)
+        progress.setWindowTitle("读取 EXIF")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        self.file_processor.prefetch_exif(parse_results, on_progress=on_progress)
+        progress.close()
+
+    def flag_corrupt(self):
+        """按设置检查绿色项的图片完整性，把损坏的标记为 Corrupt (红色)，返回标记数"""
+        mode = self.settings.get('execution', {}).get('integrity_check', 'off')
+        if mode not in ('quick', 'full'):
+            return 0
+        rows = [i for i, item in enumerate(self.model.data_list)
+                if item['parse_result'].get('status_color') == COLOR_GREEN]
+        if not rows:
+            return 0
+
+        progress = QProgressDialog("正在检查图片完整性...", "跳过检查", 0, len(rows), self)
+        progress.setWindowTitle("完整性检查")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        paths = [self.model.data_list[i]['original_path'] for i in rows]
+        corrupt = IntegrityChecker().check(paths, full=(mode == 'full'),
+                                           on_progress=on_progress, is_cancelled=progress.wasCanceled)
+        progress.close()
+
+        for i, path in zip(rows, paths):
+            if path in corrupt:
+                self.model.data_list[i]['parse_result']['corrupt_reason'] = corrupt[path]
+                self.model.mark_row(i, "Corrupt", COLOR_RED)
+        return len(corrupt)
+
     @Slot(object, object)
     def on_data_changed(self, top_left, bottom_right):
         row = top_left.row()
@@ -440,13 +582,19 @@ class MainWindow(QMainWindow):
             self.model.resort_all()
 
     def execute_rename(self):
+        # 执行前再查一次内容重复 (列表可能在添加后被重新解析过)，重复项不参与本批
+        self.flag_duplicates()
+        # 执行前完整性检查：损坏的照片标红为 Corrupt，不参与本批
+        self.flag_corrupt()
+
         green_indices = []
-        other_count = 0
+        other_indices = []
         for i, item in enumerate(self.model.data_list):
             if item['parse_result'].get('status_color') == COLOR_GREEN:
                 green_indices.append(i)
             else:
-                other_count += 1
+                other_indices.append(i)
+        other_count = len(other_indices)
 
         if not green_indices and other_count == 0:
             QMessageBox.information(self, "Info", "列表为空。")
@@ -468,81 +616,216 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Warning", "请先选择输出目录！")
             return
 
+        # 🔥🔥🔥 规划阶段：一次性构建完整 src -> dst 映射，移动前找出所有冲突 🔥🔥🔥
+        tasks = [(i, self.model.data_list[i]['original_path'], self.model.data_list[i].get('target_full_path'))
+                 for i in green_indices]
+        # 本批共用一份目录缓存：每个目标目录只列一次
+        dir_cache = DirectoryCache()
+        plan, plan_summary = RenamePlanner.build_plan(tasks, dir_cache=dir_cache)
+
+        # 批内重复目标：标记为 Collision 并移出本批
+        batch_rows = [e['index'] for e in plan if e['conflict'] == RenamePlanner.CONFLICT_BATCH]
+        for i in batch_rows:
+            self.model.mark_row(i, "Collision", COLOR_ORANGE)
+        mode = self.settings.get('execution', {}).get('output_mode', 'move')
+        # 磁盘上已存在：仍为绿色，状态显示 Exists，按统一策略处理。
+        # 打包导出不在磁盘上落地目标文件，目标路径只是归档内的条目名，同名归档由 assign_archives 加后缀
+        disk_rows = []
+        if mode != 'archive':
+            disk_rows = [e['index'] for e in plan if e['conflict'] == RenamePlanner.CONFLICT_DISK]
+        for i in disk_rows:
+            self.model.mark_row(i, "Exists")
+
+        if batch_rows:
+            QMessageBox.warning(self, "Collision",
+                                f"⚠️ {len(batch_rows)} 个文件与本批其他文件的目标路径相同，已标记为 Collision 并跳过。\n"
+                                f"请修正后再处理。")
+
+        # 磁盘冲突在移动前一次性审查 (逐行或按规则)，移动过程中不再弹窗
+        decisions = {}
+        if disk_rows:
+            dialog = ConflictReviewDialog([e for e in plan if e['conflict'] == RenamePlanner.CONFLICT_DISK], self)
+            if not dialog.exec():
+                return
+            decisions = dialog.decisions()
+
         success_count = 0
         skip_count = 0
         error_count = 0
         errors = []
-        collision_policy = 0
         indices_to_remove = []
 
-        # 🔥🔥🔥 创建新的操作日志文件 🔥🔥🔥
-        op_logger = get_operation_logger()
-        log_file_path = op_logger.create_new_log_file()
-        print(f"操作日志文件已创建: {log_file_path}")
+        journal = RenameJournal()
+        # 用户确认前不创建操作日志：规划阶段的跳过/失败先记下，确认后再写入
+        deferred_log = []
 
-        for i in green_indices:
-            task = self.model.data_list[i]
-            src = task['original_path']
-            dst = task.get('target_full_path')
+        # 1. 在主线程里把冲突全部解决成最终目标路径 (跳过 / 覆盖 / 保留两者)
+        ops = []
+        for entry in plan:
+            i = entry['index']
+            src = entry['src']
+            dst = entry['dst']
             if not dst: continue
 
+            if entry['conflict'] == RenamePlanner.CONFLICT_BATCH:
+                deferred_log.append(('skip', src, dst, f"与本批文件目标路径相同: {entry['conflict_with']}"))
+                skip_count += 1
+                continue
+
             try:
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                if os.path.exists(dst):
-                    final_dst = dst
-                    action = collision_policy
-                    if collision_policy == 0:
-                        dialog = ConflictDialog(os.path.basename(src), dst, self)
-                        if dialog.exec():
-                            action = dialog.result_action
-                            if dialog.apply_to_all: collision_policy = action
-                        else:
-                            # 用户取消了对话框
-                            op_logger.log_operation_skip(src, dst, "用户取消操作")
-                            skip_count += 1
-                            continue
-
-                    if action == 1:  # 覆盖
-                        shutil.move(src, final_dst)
-                        op_logger.log_rename_success(src, final_dst, task['parse_result'])
-                        success_count += 1
-                        indices_to_remove.append(i)
-                    elif action == 2:  # 跳过
-                        op_logger.log_operation_skip(src, dst, "目标文件已存在，用户选择跳过")
+                final_dst = dst
+                # 计划之后才落地的同名文件 (如同批"保留两者"生成的) 也按冲突处理
+                if mode != 'archive' and (entry['conflict'] == RenamePlanner.CONFLICT_DISK
+                                          or dir_cache.exists(dst)):
+                    action = decisions.get(i, ACTION_KEEP_BOTH)
+
+                    if action == ACTION_SKIP:
+                        deferred_log.append(('skip', src, dst, "目标文件已存在，用户选择跳过"))
                         skip_count += 1
-                    elif action == 3:  # 保留两者
-                        base, ext = os.path.splitext(dst)
-                        counter = 1
-                        while os.path.exists(final_dst):
-                            final_dst = f"{base}_{counter}{ext}"
-                            counter += 1
-                        shutil.move(src, final_dst)
-                        op_logger.log_rename_success(src, final_dst, task['parse_result'])
-                        success_count += 1
-                        indices_to_remove.append(i)
+                        continue
+                    if action == ACTION_KEEP_BOTH:  # 后缀在内存中计算并立即占位
+                        final_dst = dir_cache.next_free(dst, reserve=True)
+                    # ACTION_OVERWRITE: 覆盖
                 else:
-                    shutil.move(src, dst)
-                    op_logger.log_rename_success(src, dst, task['parse_result'])
-                    success_count += 1
-                    indices_to_remove.append(i)
+                    dir_cache.add(final_dst)
+
+                ops.append({'index': i, 'src': src, 'dst': final_dst})
             except Exception as e:
                 error_msg = str(e)
                 errors.append(f"{os.path.basename(src)}: {error_msg}")
-                op_logger.log_operation_error(src, error_msg)
+                deferred_log.append(('error', src, error_msg))
                 error_count += 1
 
+        # 2. 预检：按目录批量取文件大小，核对各目标盘剩余空间并估算耗时
+        exec_cfg = self.settings.get('execution', {})
+        throttle = IoThrottle.from_settings(exec_cfg)
+        history = ThroughputHistory(journal.journal_dir)
+        check = preflight(ops, mode=exec_cfg.get('output_mode', 'move'), history=history, throttle=throttle)
+        summary_text = format_preflight(check)
+        if check['enough_space']:
+            reply = QMessageBox.question(self, "确认执行", f"{summary_text}\n\n是否开始？",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        else:
+            reply = QMessageBox.warning(self, "空间不足",
+                                        f"{summary_text}\n\n⚠️ 目标盘空间不足，执行中途会失败。仍要继续吗？",
+                                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            # 什么都没做：不留下操作日志和批次日志
+            return
+
+        # 🔥🔥🔥 创建新的操作日志文件 🔥🔥🔥
+        op_logger = get_operation_logger()
+        log_file_path = op_logger.create_new_log_file()
+        print(f"操作日志文件已创建: {log_file_path}")
+        # 机器可读的批次日志，用于"撤销上一批"
+        journal.open_batch(op_log=os.path.basename(log_file_path), mode=mode)
+        for kind, *args in deferred_log:
+            if kind == 'skip':
+                op_logger.log_operation_skip(*args)
+            else:
+                op_logger.log_operation_error(*args)
+
+        # 3. 用户确认后才创建目标文件夹 (取消确认不会留下空文件夹树)；打包导出不在磁盘上创建目标文件夹
+        if mode != 'archive':
+            ready_ops = []
+            for op in ops:
+                try:
+                    dir_cache.ensure_dir(os.path.dirname(op['dst']))
+                    ready_ops.append(op)
+                except OSError as e:
+                    errors.append(f"{os.path.basename(op['src'])}: {e}")
+                    op_logger.log_operation_error(op['src'], str(e))
+                    error_count += 1
+            ops = ready_ops
+
+        # 执行前落盘批次清单：中途崩溃后可以继续或回滚
+        for op in ops:
+            pr = self.model.data_list[op['index']]['parse_result']
+            op['parse'] = {'rel_no': pr.get('rel_no'), 'std_cp': pr.get('std_cp'), 'detail': pr.get('detail'),
+                           'type': pr.get('type'), 'unit_data': {'Test': (pr.get('unit_data') or {}).get('Test')}}
+        meta = {'op_log': os.path.basename(log_file_path)}
+        transcoder = archiver = None
+        if mode == 'transcode':
+            # 转码导出：冷存储路径在规划阶段分配并写入清单，撤销时据此移回原文件
+            transcoder = Transcoder.from_settings(exec_cfg, durability=exec_cfg.get('durability', 'none'),
+                                                  throttle=throttle)
+            transcoder.assign_cold_paths(ops, dir_cache)
+            meta['transcode'] = transcoder.options()
+        elif mode == 'archive':
+            # 打包导出：每项写进哪个归档在规划阶段确定并写入清单
+            archiver = ArchiveExporter.from_settings(exec_cfg, roots=[reg_out, issue_out],
+                                                     durability=exec_cfg.get('durability', 'none'), throttle=throttle,
+                                                     illegal_chars=self.settings.get('illegal_chars'))
+            archiver.assign_archives(ops, dir_cache)
+            meta['archive'] = archiver.options()
+        manifest = BatchManifest(journal.journal_dir)
+        manifest_path = manifest.save(journal.batch_id, ops, mode=mode, **meta)
+
+        # 4. 并行执行 (按设备分组)，进度回调在 GUI 线程
+        progress = QProgressDialog("正在处理文件...", "取消", 0, len(ops), self)
+        progress.setWindowTitle("执行中")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_result(op, done, total):
+            nonlocal success_count, error_count
+            src = op['src']
+            if op.get('provisional'):
+                # 打包导出：条目已写入但归档还没落地，只推进进度，最终结果稍后再回调
+                pass
+            elif op['status'] == 'ok':
+                target, shown, extra = op['dst'], op['dst'], {}
+                if op.get('action') == 'transcode':
+                    extra = {'out_size': op['out_size'], 'cold': op.get('cold')}
+                elif op.get('action') == 'archive':
+                    # 批次日志里的目标是归档文件本身，撤销时删除整个归档
+                    target, shown, extra = op['archive'], os.path.join(op['archive'], op['arcname']), {'arcname': op['arcname']}
+                op_logger.log_rename_success(src, shown, self.model.data_list[op['index']]['parse_result'],
+                                             action=op.get('action', 'move'), digest=op.get('digest'),
+                                             sizes=(op['size'], op['out_size']) if 'out_size' in extra else None,
+                                             cold=op.get('cold'))
+                journal.record(src, target, op.get('size'), op.get('mtime'), action=op.get('action', 'move'),
+                               digest=op.get('digest'), **extra)
+                success_count += 1
+                indices_to_remove.append(op['index'])
+            elif op['status'] == 'cancelled':
+                op_logger.log_operation_skip(src, op['dst'], "用户取消操作")
+            else:
+                errors.append(f"{os.path.basename(src)}: {op['error']}")
+                op_logger.log_operation_error(src, op['error'])
+                error_count += 1
+            progress.setValue(done)
+            if throttle and done % 50 == 0:
+                progress.setLabelText(f"正在处理文件... ({throttle.describe()})")
+            QApplication.processEvents()
+
+        executor = transcoder or archiver or MoveExecutor(workers_per_group=exec_cfg.get('workers_per_device', 4),
+                                                          mode=mode,
+                                                          durability=exec_cfg.get('durability', 'none'),
+                                                          throttle=throttle)
+        executor.run(ops, on_result=on_result, is_cancelled=progress.wasCanceled)
+        if not throttle and executor.last_run:
+            # 限速下的耗时不代表磁盘真实吞吐，不计入历史
+            history.record(**executor.last_run)
+        cancelled_count = sum(1 for op in ops if op.get('status') == 'cancelled')
+        skip_count += cancelled_count
+        progress.close()
+        journal.close()
+        # 全部执行完才删除清单；取消时保留，下次启动可以继续
+        if not cancelled_count:
+            BatchManifest.remove(manifest_path)
 
         # 🔥🔥🔥 记录未就绪的项目 🔥🔥🔥
         if other_count > 0:
-            for i, item in enumerate(self.model.data_list):
-                if item['parse_result'].get('status_color') != COLOR_GREEN:
-                    src = item['original_path']
-                    status_msg = item['parse_result'].get('status_msg', 'Unknown')
-                    # 提取失败原因
-                    reason = "解析不完整或置信度较低"
-                    if "Unknown" in status_msg:
-                        reason = f"未能识别关键信息: {status_msg}"
-                    op_logger.log_parse_failure(src, reason, status_msg)
+            for i in other_indices:
+                item = self.model.data_list[i]
+                src = item['original_path']
+                status_msg = item['parse_result'].get('status_msg', 'Unknown')
+                # 提取失败原因
+                reason = "解析不完整或置信度较低"
+                if "Unknown" in status_msg:
+                    reason = f"未能识别关键信息: {status_msg}"
+                op_logger.log_parse_failure(src, reason, status_msg)
 
         # 🔥🔥🔥 写入操作汇总 🔥🔥🔥
         total_processed = len(green_indices)
@@ -554,6 +837,11 @@ class MainWindow(QMainWindow):
         if indices_to_remove:
             self.model.remove_rows_by_indices(indices_to_remove)
 
+        # 可选后处理：为本批涉及的目标文件夹生成缩略图总览
+        sheets = None
+        if exec_cfg.get('contact_sheets') and success_count:
+            sheets = self.build_contact_sheets([op for op in ops if op.get('status') == 'ok'])
+
         msg = f"成功处理 {success_count} 个文件。"
         if skip_count > 0:
             msg += f"\n⚠️ 跳过 {skip_count} 个文件。"
@@ -561,6 +849,15 @@ class MainWindow(QMainWindow):
             msg += "\n所有任务已完成！列表已清空。"
         elif other_count > 0:
             msg += f"\n({other_count} 项未就绪)"
+        if throttle and (not transcoder or transcoder.cold_dir):
+            msg += f"\n📶 实际速率: {throttle.describe()}"
+        if transcoder and success_count:
+            ok_ops = [op for op in ops if op.get('status') == 'ok']
+            in_bytes = sum(op['size'] for op in ok_ops)
+            out_bytes = sum(op['out_size'] for op in ok_ops)
+            msg += f"\n🗜️ 转码: {format_bytes(in_bytes)} -> {format_bytes(out_bytes)}"
+        if sheets:
+            msg += f"\n🗂️ 缩略图总览: 生成 {sheets['built']} 个文件夹，未变化跳过 {sheets['skipped']} 个"
         if errors:
             msg += f"\n\n{len(errors)} 个错误发生。"
             print("Errors:", errors)
@@ -568,54 +865,206 @@ class MainWindow(QMainWindow):
         QMessageBox.information(self, "Done", msg)
 
 
-class ConflictDialog(QDialog):
-    def __init__(self, filename, target_path, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("文件已存在 - 冲突解决")
-        self.resize(500, 220)
-        self.result_action = 2  # 默认 Skip
-        self.apply_to_all = False
-
-        layout = QVBoxLayout(self)
+    def build_contact_sheets(self, ops):
+        """按本批成功的操作 (op['parse'] 中的 CP / 方向作为标签) 生成各目标文件夹的缩略图总览"""
+        labels = {}
+        for op in ops:
+            parse = op.get('parse') or {}
+            labels[op['dst']] = " ".join(str(v) for v in (parse.get('std_cp'), parse.get('detail')) if v)
 
-        # 提示信息
-        info_label = QLabel(
-            f"<h3>目标文件已存在</h3>"
-            f"<p><b>文件:</b> {filename}</p>"
-            f"<p style='color:#666'><b>目标:</b> {target_path}</p>"
-            f"<p>您希望怎么做？</p>"
-        )
-        info_label.setWordWrap(True)
-        layout.addWidget(info_label)
+        progress = QProgressDialog("正在生成缩略图总览...", "取消", 0, 0, self)
+        progress.setWindowTitle("缩略图总览")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
 
-        # "应用到所有" 复选框
-        self.chk_all = QCheckBox("对剩余冲突应用此操作")
-        layout.addWidget(self.chk_all)
+        def on_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QApplication.processEvents()
 
-        layout.addSpacing(10)
+        result = ContactSheetBuilder().build(labels, on_progress=on_progress, is_cancelled=progress.wasCanceled)
+        progress.close()
+        return result
 
-        # 按钮组
-        btn_layout = QHBoxLayout()
-
-        btn_overwrite = QPushButton("覆盖")
-        btn_skip = QPushButton("跳过")
-        btn_keep = QPushButton("保留两者 (自动重命名)")
-
-        # 设置默认建议
-        btn_keep.setDefault(True)
+    def find_similar(self):
+        if self.model.rowCount() == 0:
+            QMessageBox.information(self, "Info", "列表为空。")
+            return
 
-        # 绑定点击事件：1=Overwrite, 2=Skip, 3=KeepBoth
-        btn_overwrite.clicked.connect(lambda: self.done_action(1))
-        btn_skip.clicked.connect(lambda: self.done_action(2))
-        btn_keep.clicked.connect(lambda: self.done_action(3))
+        items = []
+        for item in self.model.data_list:
+            pr = item['parse_result']
+            if not pr.get('rel_no'):
+                continue
+            items.append((item['original_path'], (pr.get('rel_no'), pr.get('std_cp'), pr.get('detail'))))
+
+        progress = QProgressDialog("正在计算感知哈希...", "取消", 0, len(items), self)
+        progress.setWindowTitle("查找相似照片")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        groups = SimilarFinder().find(items, on_progress=on_progress, is_cancelled=progress.wasCanceled)
+        progress.close()
+
+        # 状态列标记 Similar-组号，颜色不变：由审核人删掉多余的行
+        row_of = {item['original_path']: i for i, item in enumerate(self.model.data_list)}
+        for gid, group in enumerate(groups, 1):
+            for path in group:
+                row = row_of[path]
+                self.model.data_list[row]['parse_result']['similar_group'] = gid
+                self.model.mark_row(row, f"Similar-{gid}")
+
+        if not groups:
+            QMessageBox.information(self, "查找相似照片", "没有发现相似照片。")
+            return
+        QMessageBox.information(self, "查找相似照片",
+                                f"发现 {len(groups)} 组相似照片，共 {sum(len(g) for g in groups)} 张。\n"
+                                f"状态列已标记为 Similar-组号，可选中多余的行按 Delete 删除。")
 
-        btn_layout.addWidget(btn_overwrite)
-        btn_layout.addWidget(btn_skip)
-        btn_layout.addWidget(btn_keep)
+    def export_plan(self):
+        if self.model.rowCount() == 0:
+            QMessageBox.information(self, "Info", "列表为空。")
+            return
+        path, selected = QFileDialog.getSaveFileName(self, "导出重命名计划", "rename_plan.jsonl",
+                                                     "JSONL (*.jsonl);;CSV (*.csv)")
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += ".csv" if selected.startswith("CSV") else ".jsonl"
+
+        rows = build_plan_rows(self.model.data_list)
+        try:
+            write_plan(rows, path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"导出失败: {e}")
+            return
+        ready = sum(1 for r in rows if r['ready'])
+        conflicts = sum(1 for r in rows if r['conflict'])
+        QMessageBox.information(self, "导出完成",
+                                f"共 {len(rows)} 项，就绪 {ready} 项，冲突 {conflicts} 项。\n\n"
+                                f"📄 {os.path.basename(path)}\n\n"
+                                f"稍后执行: python main.py --run-plan \"{path}\"")
+
+    def undo_last_batch(self):
+        journal_path = RenameJournal().find_last_batch()
+        if not journal_path:
+            QMessageBox.information(self, "Info", "没有可撤销的批次。")
+            return
 
-        layout.addLayout(btn_layout)
+        header, records, _ = RenameJournal.read(journal_path)
+        reply = QMessageBox.question(self, "撤销上一批",
+                                     f"批次 {header.get('batch_id', '?')} 共 {len(records)} 个文件。\n"
+                                     f"是否全部撤销？(移动的文件移回原位置，复制/链接生成的副本将被删除)",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.No: return
+
+        progress = QProgressDialog("正在撤销...", "取消", 0, len(records), self)
+        progress.setWindowTitle("撤销中")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_result(op, done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        exec_cfg = self.settings.get('execution', {})
+        summary = undo_batch(journal_path, workers_per_group=exec_cfg.get('workers_per_device', 4),
+                             on_result=on_result, is_cancelled=progress.wasCanceled,
+                             durability=exec_cfg.get('durability', 'none'),
+                             throttle=IoThrottle.from_settings(exec_cfg))
+        progress.close()
+
+        # 恢复的文件重新放回列表，方便修正后再处理
+        if self.excel_engine.is_loaded():
+            restored = [r['src'] for r in records if os.path.exists(r['src']) and not os.path.exists(r['dst'])]
+            self.process_files(restored)
+
+        msg = f"已恢复 {summary['restored']} 个文件。"
+        if summary['skipped']:
+            msg += f"\n⚠️ 跳过 {summary['skipped']} 个。"
+        if summary['cancelled']:
+            msg += f"\n⏹️ 取消 {summary['cancelled']} 个。"
+        if summary['errors']:
+            msg += f"\n❌ {summary['errors']} 个失败。"
+        if summary['cancelled'] or summary['errors']:
+            msg += "\n\n批次未全部撤销，可再次点击\"撤销上一批\"继续。"
+        for line in summary['details']:
+            logger.info(f"撤销: {line}")
+        QMessageBox.information(self, "撤销完成", msg)
+
+    def check_pending_batches(self):
+        manifest = BatchManifest()
+        for path in manifest.find_pending():
+            try:
+                info, done, remaining = inspect_manifest(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法读取批次清单 {path}: {e}")
+                continue
 
-    def done_action(self, action_code):
-        self.result_action = action_code
-        self.apply_to_all = self.chk_all.isChecked()
-        self.accept()
\ No newline at end of file
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Warning)
+            box.setWindowTitle("发现未完成的批次")
+            box.setText(f"批次 {info.get('batch_id', '?')} ({info.get('created', '')}) 没有执行完。\n"
+                        f"已完成 {len(done)} 个，剩余 {len(remaining)} 个。\n\n"
+                        f"继续执行：跳过已完成的文件，处理剩余部分。\n"
+                        f"回滚：把已完成的文件恢复到原位置。")
+            btn_resume = box.addButton("继续执行", QMessageBox.AcceptRole)
+            btn_rollback = box.addButton("回滚", QMessageBox.DestructiveRole)
+            box.addButton("稍后处理", QMessageBox.RejectRole)
+            box.exec()
+
+            clicked = box.clickedButton()
+            if clicked == btn_resume:
+                self.run_pending_batch(path, resume=True, total=len(info['ops']))
+            elif clicked == btn_rollback:
+                self.run_pending_batch(path, resume=False, total=len(done))
+
+    def run_pending_batch(self, path, resume, total):
+        progress = QProgressDialog("正在继续执行..." if resume else "正在回滚...", "取消", 0, total, self)
+        progress.setWindowTitle("执行中" if resume else "回滚中")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_result(op, done, count):
+            progress.setMaximum(count)
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        exec_cfg = self.settings.get('execution', {})
+        workers = exec_cfg.get('workers_per_device', 4)
+        durability = exec_cfg.get('durability', 'none')
+        throttle = IoThrottle.from_settings(exec_cfg)
+        if resume:
+            summary = resume_batch(path, workers_per_group=workers, durability=durability, throttle=throttle,
+                                   on_result=on_result, is_cancelled=progress.wasCanceled)
+            msg = f"已完成 {summary['done']} 个文件。"
+            if summary['skipped']:
+                msg += f"\n⏭️ 跳过 {summary['skipped']} 个 (已完成或源文件不存在)。"
+            if summary['cancelled']:
+                msg += f"\n⚠️ 取消 {summary['cancelled']} 个，下次启动可继续。"
+            if summary['errors']:
+                msg += f"\n❌ {summary['errors']} 个失败。"
+            if summary['rate']:
+                msg += f"\n📶 实际速率: {summary['rate']}"
+            msg += f"\n\n📝 操作日志已保存至:\n{os.path.basename(summary['log_file'])}"
+        else:
+            summary = rollback_batch(path, workers_per_group=workers, durability=durability, throttle=throttle,
+                                     on_result=on_result, is_cancelled=progress.wasCanceled)
+            msg = f"已恢复 {summary['restored']} 个文件。"
+            if summary['skipped']:
+                msg += f"\n⚠️ 跳过 {summary['skipped']} 个。"
+            if summary['cancelled']:
+                msg += f"\n⏹️ 取消 {summary['cancelled']} 个。"
+            if summary['errors']:
+                msg += f"\n❌ {summary['errors']} 个失败。"
+            if summary['cancelled'] or summary['errors']:
+                msg += "\n\n回滚未全部完成，下次启动可继续回滚。"
+        progress.close()
+        for line in summary['details']:
+            logger.info(f"{'继续执行' if resume else '回滚'}: {line}")
+        QMessageBox.information(self, "完成", msg)
@@ -196,7 +196,7 @@ class PhotoTableModel(QAbstractTableModel):
             self.resort_all()
 
     def _sort_photos(self, parser_results):
-        """按照Rel No→CP→方向→Issue的顺序排序"""
+        """按照Rel No→CP→方向→Issue的顺序排序，同一方向的多张再按拍摄时间→相机 (已读取 EXIF 时)"""
         def sort_key(res):
             # 1. Rel No（版本号）- 优先排序
             rel_no = res.get('rel_no', '')
@@ -224,7 +224,12 @@ class PhotoTableModel(QAbstractTableModel):
                 detail_num = self._extract_number(detail)
                 detail_str = detail
             
-            return (rel_no_num, cp_num, photo_type, detail_num, detail_str)
+            # 5. 拍摄时间、相机 - 没有 EXIF 的排到最后
+            exif = res.get('exif') or {}
+            shot = (exif.get('ExifDate') or '') + (exif.get('ExifTime') or '')
+            camera = exif.get('ExifCamera') or ''
+
+            return (rel_no_num, cp_num, photo_type, detail_num, detail_str, not shot, shot, camera)
         
         return sorted(parser_results, key=sort_key)
 
@@ -291,7 +296,21 @@ class PhotoTableModel(QAbstractTableModel):
         return None
 
     def update_row(self, row, new_parse_result):
+        # 内容重复来自文件内容而不是文件名解析：同一文件重新解析后保留 Duplicate 标记
+        old = self.data_list[row]['parse_result']
+        if old.get('duplicate_of') and 'duplicate_of' not in new_parse_result:
+            new_parse_result['duplicate_of'] = old['duplicate_of']
+            new_parse_result['status_msg'] = "Duplicate"
+            new_parse_result['status_color'] = COLOR_ORANGE
         self.data_list[row]['parse_result'] = new_parse_result
         self.data_list[row]['target_filename'] = new_parse_result.get('target_filename', '')
         self.data_list[row]['target_full_path'] = new_parse_result.get('target_full_path', '')
-        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
\ No newline at end of file
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def mark_row(self, row, status_msg, status_color=None):
+        """只更新某行的状态 (如 Collision / Exists)，不重新解析"""
+        res = self.data_list[row]['parse_result']
+        res['status_msg'] = status_msg
+        if status_color:
+            res['status_color'] = status_color
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
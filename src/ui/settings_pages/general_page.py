@@ -1,5 +1,5 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QHBoxLayout, QToolButton, QFileDialog, QFrame, \
-    QScrollArea
+    QScrollArea, QComboBox, QSpinBox, QDoubleSpinBox, QFormLayout, QCheckBox
 from PySide6.QtCore import Qt, QUrl
 from PySide6.QtGui import QDesktopServices
 import os
@@ -9,6 +9,38 @@ from src.core.config_manager import ConfigManager
 
 
 class GeneralPage(QWidget):
+    OUTPUT_MODE_ITEMS = [
+        ('move', "移动 (默认)"),
+        ('copy', "复制 (保留原文件)"),
+        ('hardlink', "硬链接 (同盘零拷贝，跨盘自动复制)"),
+        ('reflink', "克隆 reflink (Linux btrfs/XFS，不支持时复制)"),
+        ('transcode', "转码导出 (缩小尺寸并重新压缩)"),
+        ('archive', "打包导出 (ZIP / TAR，原文件保留)"),
+    ]
+
+    ARCHIVE_FORMAT_ITEMS = [
+        ('zip', "ZIP (存储，不压缩)"),
+        ('tar', "TAR"),
+    ]
+
+    ARCHIVE_GROUP_ITEMS = [
+        ('rel_no', "每个机台号一个归档"),
+        ('folder', "每个目标文件夹一个归档"),
+    ]
+
+    DURABILITY_ITEMS = [
+        ('none', "不强制落盘 (最快)"),
+        ('files', "批末统一落盘文件"),
+        ('files_dirs', "批末统一落盘文件和目录 (推荐)"),
+        ('per_file', "逐个文件落盘 (最慢)"),
+    ]
+
+    INTEGRITY_ITEMS = [
+        ('off', "不检查"),
+        ('quick', "快速 (检查文件头尾标记)"),
+        ('full', "完整 (额外解码校验，较慢)"),
+    ]
+
     def __init__(self, settings, parent=None):
         super().__init__(parent)
         self.settings = settings
@@ -76,7 +108,7 @@ class GeneralPage(QWidget):
             btn.setCursor(Qt.PointingHandCursor)
             
             if is_file:
-                btn.clicked.connect(lambda: self.browse_file(le, "CSV (*.csv)"))
+                btn.clicked.connect(lambda: self.browse_file(le, "Data Files (*.csv *.xlsx *.xlsm)"))
             else:
                 btn.clicked.connect(lambda: self.browse_dir(le))
             
@@ -86,13 +118,129 @@ class GeneralPage(QWidget):
             self.widgets[key] = le
             layout_paths.addLayout(v_box)
 
-        add_path_row("默认 CSV 数据表:", 'excel_path', is_file=True)
+        add_path_row("默认数据表 (CSV / XLSX):", 'excel_path', is_file=True)
+
+        # XLSX 工作表名 (留空 = 自动识别包含表头的工作表)
+        lbl_sheet = QLabel("XLSX 工作表 (留空自动识别):")
+        lbl_sheet.setStyleSheet("font-weight: 500; color: #333; font-size: 13px;")
+        layout_paths.addWidget(lbl_sheet)
+        self.widgets['excel_sheet'] = QLineEdit(last_session.get('excel_sheet', ''))
+        self.widgets['excel_sheet'].setObjectName("InputBox")
+        layout_paths.addWidget(self.widgets['excel_sheet'])
+
         add_path_row("Regular 默认输出文件夹:", 'regular_output_dir')
         add_path_row("Issue 默认输出文件夹:", 'issue_output_dir')
         
         content_layout.addWidget(card_paths)
 
-        # --- Card 3: Configuration File ---
+        # --- Card 3: Execution ---
+        card_exec = self.create_card("执行选项")
+        layout_exec = card_exec.layout()
+        exec_cfg = self.settings.get('execution', {})
+
+        form_exec = QFormLayout()
+        form_exec.setSpacing(10)
+
+        self.widgets['output_mode'] = QComboBox()
+        for mode, text in self.OUTPUT_MODE_ITEMS:
+            self.widgets['output_mode'].addItem(text, mode)
+        idx = self.widgets['output_mode'].findData(exec_cfg.get('output_mode', 'move'))
+        self.widgets['output_mode'].setCurrentIndex(max(idx, 0))
+        form_exec.addRow("输出方式:", self.widgets['output_mode'])
+
+        self.widgets['workers_per_device'] = QSpinBox()
+        self.widgets['workers_per_device'].setRange(1, 32)
+        self.widgets['workers_per_device'].setValue(int(exec_cfg.get('workers_per_device', 4)))
+        form_exec.addRow("每个磁盘并发数:", self.widgets['workers_per_device'])
+
+        # 转码导出参数 (输出方式为"转码导出"时生效)
+        self.widgets['transcode_max_dimension'] = QSpinBox()
+        self.widgets['transcode_max_dimension'].setRange(0, 20000)
+        self.widgets['transcode_max_dimension'].setSingleStep(256)
+        self.widgets['transcode_max_dimension'].setSuffix(" px")
+        self.widgets['transcode_max_dimension'].setSpecialValueText("不缩小")
+        self.widgets['transcode_max_dimension'].setValue(int(exec_cfg.get('transcode_max_dimension', 2048) or 0))
+        form_exec.addRow("转码长边上限:", self.widgets['transcode_max_dimension'])
+
+        self.widgets['transcode_quality'] = QSpinBox()
+        self.widgets['transcode_quality'].setRange(1, 100)
+        self.widgets['transcode_quality'].setValue(int(exec_cfg.get('transcode_quality', 85)))
+        form_exec.addRow("转码 JPEG 质量:", self.widgets['transcode_quality'])
+
+        h_cold = QHBoxLayout()
+        self.widgets['cold_dir'] = QLineEdit(exec_cfg.get('cold_dir', ''))
+        self.widgets['cold_dir'].setObjectName("InputBox")
+        self.widgets['cold_dir'].setPlaceholderText("留空则原文件保留在原处")
+        btn_cold = QToolButton()
+        btn_cold.setText("...")
+        btn_cold.setObjectName("BrowseButton")
+        btn_cold.setCursor(Qt.PointingHandCursor)
+        btn_cold.clicked.connect(lambda: self.browse_dir(self.widgets['cold_dir']))
+        h_cold.addWidget(self.widgets['cold_dir'])
+        h_cold.addWidget(btn_cold)
+        form_exec.addRow("转码后原文件移至:", h_cold)
+
+        # 打包导出参数 (输出方式为"打包导出"时生效)
+        for key, items, default, label in (
+                ('archive_format', self.ARCHIVE_FORMAT_ITEMS, 'zip', "归档格式:"),
+                ('archive_group', self.ARCHIVE_GROUP_ITEMS, 'rel_no', "归档分组:")):
+            self.widgets[key] = QComboBox()
+            for value, text in items:
+                self.widgets[key].addItem(text, value)
+            idx = self.widgets[key].findData(exec_cfg.get(key, default))
+            self.widgets[key].setCurrentIndex(max(idx, 0))
+            form_exec.addRow(label, self.widgets[key])
+
+        self.widgets['durability'] = QComboBox()
+        for mode, text in self.DURABILITY_ITEMS:
+            self.widgets['durability'].addItem(text, mode)
+        idx = self.widgets['durability'].findData(exec_cfg.get('durability', 'none'))
+        self.widgets['durability'].setCurrentIndex(max(idx, 0))
+        self.widgets['durability'].setToolTip("断电保护：批末模式在全部文件处理完后并行 fsync 一轮")
+        form_exec.addRow("落盘策略:", self.widgets['durability'])
+
+        self.widgets['integrity_check'] = QComboBox()
+        for mode, text in self.INTEGRITY_ITEMS:
+            self.widgets['integrity_check'].addItem(text, mode)
+        idx = self.widgets['integrity_check'].findData(exec_cfg.get('integrity_check', 'off'))
+        self.widgets['integrity_check'].setCurrentIndex(max(idx, 0))
+        self.widgets['integrity_check'].setToolTip("执行前并行检查图片是否截断/损坏，损坏的标记为 Corrupt 不参与执行")
+        form_exec.addRow("完整性检查:", self.widgets['integrity_check'])
+
+        # 共享存储 (NAS) 限速，0 表示不限
+        self.widgets['max_mb_per_sec'] = QDoubleSpinBox()
+        self.widgets['max_mb_per_sec'].setRange(0, 10000)
+        self.widgets['max_mb_per_sec'].setDecimals(1)
+        self.widgets['max_mb_per_sec'].setSuffix(" MB/s")
+        self.widgets['max_mb_per_sec'].setSpecialValueText("不限")
+        self.widgets['max_mb_per_sec'].setValue(float(exec_cfg.get('max_mb_per_sec', 0) or 0))
+        form_exec.addRow("带宽上限:", self.widgets['max_mb_per_sec'])
+
+        self.widgets['max_files_per_sec'] = QSpinBox()
+        self.widgets['max_files_per_sec'].setRange(0, 100000)
+        self.widgets['max_files_per_sec'].setSuffix(" 个/秒")
+        self.widgets['max_files_per_sec'].setSpecialValueText("不限")
+        self.widgets['max_files_per_sec'].setValue(int(exec_cfg.get('max_files_per_sec', 0) or 0))
+        form_exec.addRow("文件数上限:", self.widgets['max_files_per_sec'])
+
+        self.widgets['max_in_flight'] = QSpinBox()
+        self.widgets['max_in_flight'].setRange(0, 256)
+        self.widgets['max_in_flight'].setSpecialValueText("不限")
+        self.widgets['max_in_flight'].setValue(int(exec_cfg.get('max_in_flight', 0) or 0))
+        form_exec.addRow("同时进行的操作数上限:", self.widgets['max_in_flight'])
+
+        self.widgets['adaptive_throttle'] = QCheckBox("按延迟自动调整并发 (共享存储拥塞时自动降速)")
+        self.widgets['adaptive_throttle'].setChecked(bool(exec_cfg.get('adaptive_throttle', False)))
+        form_exec.addRow("", self.widgets['adaptive_throttle'])
+
+        self.widgets['contact_sheets'] = QCheckBox("执行后为每个目标文件夹生成缩略图总览 (_ContactSheet.jpg)")
+        self.widgets['contact_sheets'].setChecked(bool(exec_cfg.get('contact_sheets', False)))
+        form_exec.addRow("", self.widgets['contact_sheets'])
+
+        layout_exec.addLayout(form_exec)
+        content_layout.addWidget(card_exec)
+
+        # --- Card 4: Configuration File ---
         card_config = self.create_card("配置文件位置")
         layout_config = card_config.layout()
         
@@ -233,5 +381,23 @@ class GeneralPage(QWidget):
         # 2. Session Paths
         if 'last_session' not in self.settings: self.settings['last_session'] = {}
         self.settings['last_session']['excel_path'] = self.widgets['excel_path'].text()
+        self.settings['last_session']['excel_sheet'] = self.widgets['excel_sheet'].text().strip()
         self.settings['last_session']['regular_output_dir'] = self.widgets['regular_output_dir'].text()
-        self.settings['last_session']['issue_output_dir'] = self.widgets['issue_output_dir'].text()
\ No newline at end of file
+        self.settings['last_session']['issue_output_dir'] = self.widgets['issue_output_dir'].text()
+
+        # 3. Execution
+        exec_cfg = self.settings.setdefault('execution', {})
+        exec_cfg['output_mode'] = self.widgets['output_mode'].currentData()
+        exec_cfg['workers_per_device'] = self.widgets['workers_per_device'].value()
+        exec_cfg['transcode_max_dimension'] = self.widgets['transcode_max_dimension'].value()
+        exec_cfg['transcode_quality'] = self.widgets['transcode_quality'].value()
+        exec_cfg['cold_dir'] = self.widgets['cold_dir'].text().strip()
+        exec_cfg['archive_format'] = self.widgets['archive_format'].currentData()
+        exec_cfg['archive_group'] = self.widgets['archive_group'].currentData()
+        exec_cfg['durability'] = self.widgets['durability'].currentData()
+        exec_cfg['integrity_check'] = self.widgets['integrity_check'].currentData()
+        exec_cfg['max_mb_per_sec'] = self.widgets['max_mb_per_sec'].value()
+        exec_cfg['max_files_per_sec'] = self.widgets['max_files_per_sec'].value()
+        exec_cfg['max_in_flight'] = self.widgets['max_in_flight'].value()
+        exec_cfg['adaptive_throttle'] = self.widgets['adaptive_throttle'].isChecked()
+        exec_cfg['contact_sheets'] = self.widgets['contact_sheets'].isChecked()
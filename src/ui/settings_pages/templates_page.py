@@ -1,5 +1,6 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QHBoxLayout, QPushButton, QFrame, QTabWidget
 from PySide6.QtCore import Qt, QEvent
+from src.core.exif_reader import EXIF_KEYS
 
 
 class TemplatesPage(QWidget):
@@ -17,7 +18,9 @@ class TemplatesPage(QWidget):
             "SN": "SN123456", "Mode": "Stow", "WF": "2", "Test": "1mG",
             "__CP__": "25Drop",
             "__O__": "O1",
-            "__Issue__": "Crack"
+            "__Issue__": "Crack",
+            "ExifDate": "20240315", "ExifTime": "143012", "ExifCamera": "iPhone 15 Pro",
+            "ExifWidth": "4032", "ExifHeight": "3024"
         }
 
         # 🔥 2. 暂存当前的变量名映射 (默认值)
@@ -148,6 +151,7 @@ class TemplatesPage(QWidget):
         else:
             orient_tag = parsed_vars.get('O', 'Orient')
             tags += [cp_tag, orient_tag]
+        tags += list(EXIF_KEYS)
 
         for tag in tags:
             clean_tag = tag.replace("{", "").replace("}", "")
@@ -33,6 +33,7 @@ ASSETS_DIR = os.path.join(APP_ROOT, 'assets')
 DEFAULT_SETTINGS = {
   "last_session": {
       "excel_path": "",
+      "excel_sheet": "",
       "regular_output_dir": "",
       "issue_output_dir": ""
   },
@@ -61,7 +62,23 @@ DEFAULT_SETTINGS = {
       "Issue": "Issue"
     }
   },
-  "illegal_chars": ["/", "\\", ":", "*", "?", "\"", "<", ">", "|"]
+  "illegal_chars": ["/", "\\", ":", "*", "?", "\"", "<", ">", "|"],
+  "execution": {
+    "output_mode": "move",
+    "workers_per_device": 4,
+    "transcode_max_dimension": 2048,
+    "transcode_quality": 85,
+    "cold_dir": "",
+    "archive_format": "zip",
+    "archive_group": "rel_no",
+    "durability": "none",
+    "integrity_check": "off",
+    "max_mb_per_sec": 0,
+    "max_files_per_sec": 0,
+    "max_in_flight": 0,
+    "adaptive_throttle": False,
+    "contact_sheets": False
+  }
 }
 
 # 默认 CP Map
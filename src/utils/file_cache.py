@@ -0,0 +1,85 @@
+import os
+import json
+import threading
+from loguru import logger
+from src.utils.operation_logger import get_operation_logger
+
+# 每个缓存最多保留的条目数，超出时淘汰最久未用的 (删除/改名/修改过的文件的旧条目不会无限累积)
+MAX_ENTRIES = 50000
+
+
+class FileCache:
+    """
+    按 (路径, 大小, 修改时间) 缓存单个文件的分析结果 (感知哈希、完整性检查、EXIF 等)，
+    持久化为操作日志目录下 cache/<name>.json。文件被改过 (大小或修改时间变化) 后自动失效。
+    条目按最近使用排序 (命中时移到末尾)，保存时只保留最近的 max_entries 条。
+    """
+
+    def __init__(self, name, cache_dir=None, max_entries=MAX_ENTRIES):
+        cache_dir = cache_dir or os.path.join(get_operation_logger().log_dir, 'cache')
+        self.path = os.path.join(cache_dir, f"{name}.json")
+        self._lock = threading.Lock()
+        self._data = None
+        self._dirty = False
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(path, size, mtime):
+        return f"{os.path.normcase(os.path.abspath(path))}|{size}|{mtime}"
+
+    @staticmethod
+    def key_for(path):
+        """直接 stat 文件生成 Key，文件不存在时返回 None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return FileCache.key(path, st.st_size, st.st_mtime)
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            data = self._load()
+            value = data.pop(key, None)
+            if value is not None:
+                # 移到末尾：最近用过的条目最后才被淘汰 (只是命中不触发保存)
+                data[key] = value
+            return value
+
+    def set(self, key, value):
+        if key is None:
+            return
+        with self._lock:
+            data = self._load()
+            data.pop(key, None)
+            data[key] = value
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            excess = len(self._data) - self.max_entries
+            if excess > 0:
+                for key in list(self._data)[:excess]:
+                    del self._data[key]
+                logger.info(f"🧹 缓存 {os.path.basename(self.path)} 淘汰 {excess} 条最久未用的记录")
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self._data, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"无法保存缓存 {self.path}: {e}")
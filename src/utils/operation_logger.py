@@ -54,7 +54,12 @@ Photo Renamer Pro - 操作日志
         self.log_handle.write(header)
         self.log_handle.flush()
     
-    def log_rename_success(self, original_path, target_path, parse_result):
+    # 输出模式的中文名
+    ACTION_NAMES = {'move': '移动', 'copy': '复制', 'hardlink': '硬链接', 'reflink': '克隆 (reflink)',
+                    'transcode': '转码', 'archive': '打包'}
+
+    def log_rename_success(self, original_path, target_path, parse_result, action='move', digest=None,
+                           sizes=None, cold=None):
         """
         记录成功的重命名操作
         
@@ -62,6 +67,10 @@ Photo Renamer Pro - 操作日志
             original_path: 原始文件完整路径
             target_path: 目标文件完整路径
             parse_result: 解析结果字典
+            action: 实际执行的输出模式 (move / copy / hardlink / reflink)
+            digest: 跨设备校验复制时的 blake2b 摘要
+            sizes: 转码时的 (输入字节数, 输出字节数)
+            cold: 转码后原文件移到的冷存储路径
         """
         if not self.log_handle:
             return
@@ -83,8 +92,15 @@ Photo Renamer Pro - 操作日志
    新文件: {target_name}
    新位置: {target_path}
    解析信息: CP={std_cp} | 机台号={rel_no} | Test={test} | Detail={detail} | Type={photo_type}
-
 """
+        if action != 'move':
+            kept = f"原文件移至 {cold}" if cold else "原文件保留"
+            log_entry += f"   处理方式: {self.ACTION_NAMES.get(action, action)} ({kept})\n"
+        if sizes and sizes[0] and sizes[1] is not None:
+            log_entry += f"   文件大小: {sizes[0] / 1024:.1f} KB -> {sizes[1] / 1024:.1f} KB ({sizes[1] / sizes[0]:.0%})\n"
+        if digest:
+            log_entry += f"   校验摘要: blake2b={digest}\n"
+        log_entry += "\n"
         self.log_handle.write(log_entry)
         self.log_handle.flush()
     
@@ -0,0 +1,97 @@
+import os
+import json
+import glob
+from datetime import datetime
+from src.utils.operation_logger import get_operation_logger
+
+
+class RenameJournal:
+    """
+    机器可读的重命名日志 (JSONL，只追加)
+    与 OperationLogger 的中文文本日志并存：每个批次一个文件，
+    每成功一项写一条 (src, dst, size, mtime, action) 记录，用于自动撤销。
+    """
+
+    def __init__(self, journal_dir=None):
+        # 默认放在操作日志目录下的 journal/ 子目录
+        self.journal_dir = journal_dir or os.path.join(get_operation_logger().log_dir, 'journal')
+        self.current_path = None
+        self.batch_id = None
+        self.handle = None
+
+    def open_batch(self, batch_id=None, **meta):
+        """开始一个新批次，写入头记录，返回日志文件路径"""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.batch_id = batch_id or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.current_path = self.path_for(self.batch_id)
+        self.handle = open(self.current_path, 'a', encoding='utf-8')
+        self._write({'type': 'batch', 'batch_id': self.batch_id,
+                     'created': datetime.now().isoformat(timespec='seconds'), **meta})
+        return self.current_path
+
+    def path_for(self, batch_id):
+        """批次日志文件路径 (同一 batch_id 再次 open_batch 会追加到同一文件)"""
+        return os.path.join(self.journal_dir, f"batch_{batch_id}.jsonl")
+
+    def record(self, src, dst, size=None, mtime=None, action='move', **extra):
+        """记录一项已完成的操作"""
+        self._write({'type': 'op', 'src': src, 'dst': dst, 'size': size, 'mtime': mtime,
+                     'action': action, **extra})
+
+    def _write(self, obj):
+        if not self.handle:
+            return
+        self.handle.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self.handle.flush()
+
+    def close(self):
+        if self.handle:
+            self.handle.close()
+            self.handle = None
+
+    # ---- 读取 / 撤销辅助 ----
+
+    @staticmethod
+    def read(path):
+        """
+        读取一个批次日志
+        Returns: (header, ops, undone)
+        """
+        header, ops, undone = {}, [], False
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能写了一半，忽略
+                    continue
+                rtype = rec.get('type')
+                if rtype == 'batch':
+                    header = rec
+                elif rtype == 'op':
+                    ops.append(rec)
+                elif rtype == 'undo':
+                    undone = True
+        return header, ops, undone
+
+    @staticmethod
+    def mark_undone(path, summary):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'undo', 'at': datetime.now().isoformat(timespec='seconds'),
+                                **summary}, ensure_ascii=False) + "\n")
+
+    def list_batches(self):
+        """按时间倒序列出所有批次日志"""
+        files = glob.glob(os.path.join(self.journal_dir, "batch_*.jsonl"))
+        return sorted(files, reverse=True)
+
+    def find_last_batch(self):
+        """最近一个尚未撤销、且有操作记录的批次"""
+        for path in self.list_batches():
+            _, ops, undone = self.read(path)
+            if ops and not undone:
+                return path
+        return None